@@ -2,38 +2,69 @@ from langgraph.graph import END, START, StateGraph
 
 from app.agents.document_parser.nodes import (
     save_file_node,
+    dedup_node,
     parser_agent,
     chunking_node,
     embedding_node,
     store_embeddings_node,
-    predict_category_node
+    predict_category_node,
+    streaming_ingest_node
 )
 
 from app.agents.document_parser.state import State
+from app.core.settings import settings
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
+# Status field each node reports its outcome in
+STAGE_STATUS_FIELDS = {
+    "DedupNode": "dedup_status",
+    "ParserNode": "extraction_status",
+    "ChunkingNode": "chunking_status",
+    "EmbeddingNode": "embedding_status",
+    "CategoryPredictionNode": "category_prediction_status",
+    "StoreEmbeddingsNode": "storage_status",
+    "StreamingIngestNode": "storage_status",
+}
+
+
+def route_after_dedup(state: State) -> str:
+    """Skip the pipeline for content that is already ingested"""
+    if state.get("dedup_status") == "duplicate":
+        return END
+    streaming = state.get("streaming")
+    if streaming is None:
+        streaming = settings.INGESTION_STREAMING
+    if streaming:
+        return "StreamingIngestNode"
+    return "ParserNode"
+
+
 async def document_parser_graph(checkpointer) -> StateGraph:
 
     graph_builder = StateGraph(State)
 
     # Add all nodes
     # graph_builder.add_node("SaveFileNode", save_file_node)
+    graph_builder.add_node("DedupNode", dedup_node)
     graph_builder.add_node("ParserNode", parser_agent)
     graph_builder.add_node("ChunkingNode", chunking_node)
     graph_builder.add_node("EmbeddingNode", embedding_node)
     graph_builder.add_node("CategoryPredictionNode", predict_category_node)
     graph_builder.add_node("StoreEmbeddingsNode", store_embeddings_node)
+    graph_builder.add_node("StreamingIngestNode", streaming_ingest_node)
 
     # Define workflow
     # graph_builder.add_edge(START, "SaveFileNode")
-    graph_builder.add_edge(START, "ParserNode")
+    graph_builder.add_edge(START, "DedupNode")
+    graph_builder.add_conditional_edges("DedupNode", route_after_dedup, ["ParserNode", "StreamingIngestNode", END])
     graph_builder.add_edge("ParserNode", "ChunkingNode")
     graph_builder.add_edge("ChunkingNode", "EmbeddingNode")
     graph_builder.add_edge("EmbeddingNode", "CategoryPredictionNode")
     graph_builder.add_edge("CategoryPredictionNode", "StoreEmbeddingsNode")
     graph_builder.add_edge("StoreEmbeddingsNode", END)
+    graph_builder.add_edge("StreamingIngestNode", END)
 
     return graph_builder.compile(
         name="DocumentParserGraph",
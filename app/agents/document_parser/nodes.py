@@ -1,17 +1,21 @@
 import os
 import json
 import asyncio
+from collections import defaultdict
 
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 
 from app.core.settings import settings
 from app.agents.document_parser.state import State
 from app.agents.document_parser.tools import (
     extract_docx_text, 
     extract_excel_text, 
+    iter_excel_blocks,
     extract_image_text, 
     extract_pdf_text,
-    extract_arabic_with_tesseract
+    extract_arabic_with_tesseract,
+    iter_pdf_blocks
     )
 
 from app.utils.logger import get_logger
@@ -27,16 +31,37 @@ def get_extractor(filepath: str):
         file_type = ext[1:].lower() if ext else ''  # Remove the dot and convert to lower case
 
         if file_type == "pdf":
-            return extract_arabic_with_tesseract
+            return extract_pdf_text
         elif file_type in ["doc", "docx"]:
             return extract_docx_text
-        elif file_type in ["xls", "xlsx"]:
+        elif file_type in ["xls", "xlsx", "xlsm"]:
             return extract_excel_text
         elif file_type in ["jpg", "jpeg", "png", "tiff"]:
             return extract_image_text
         return None
 
 
+def get_block_iterator(filepath: str):
+        """Get a generator of text blocks for streaming extraction"""
+        _, ext = os.path.splitext(filepath)
+        file_type = ext[1:].lower() if ext else ''
+
+        if file_type == "pdf":
+            return iter_pdf_blocks
+        if file_type in ["xls", "xlsx", "xlsm"]:
+            return iter_excel_blocks
+
+        extractor = get_extractor(filepath)
+        if not extractor:
+            return None
+
+        # Extractors without block output yield the whole text as one block
+        def iter_single_block(input_path: str):
+            yield {"page": None, "text": extractor(input_path=input_path).get("text") or ""}
+
+        return iter_single_block
+
+
 async def save_file_node(state: State) -> State:
     """Node to save uploaded file and update state with file path."""
     logger.info("Starting Save File Node.")
@@ -63,6 +88,46 @@ async def save_file_node(state: State) -> State:
         return state
 
 
+async def dedup_node(state: State) -> State:
+    """Node to skip documents whose exact content was already ingested."""
+    logger.info("Starting Dedup Node.")
+
+    file_path = state.get("file_path")
+    original_filename = state.get("original_filename")
+
+    try:
+        from app.services.document_index import document_index, hash_file  # Import here to avoid circular dependency
+
+        content_hash = state.get("content_hash")
+        if not content_hash:
+            content_hash = await asyncio.to_thread(hash_file, file_path)
+            state["content_hash"] = content_hash
+
+        existing = await document_index.get_document(content_hash)
+        if existing:
+            logger.info(f"Duplicate upload of {existing['original_filename']}, skipping pipeline.")
+            state["predicted_category"] = existing["file_category"]
+            state["dedup_status"] = "duplicate"
+            return state
+
+        # An earlier document under the same filename lets unchanged chunks be
+        # reused; it is only replaced when the upload asked for it
+        previous = await document_index.get_latest_version(original_filename)
+        state["previous_content_hash"] = previous["content_hash"] if previous else None
+        state["replace_previous"] = bool(previous and state.get("replace"))
+        state["dedup_status"] = "changed" if state["replace_previous"] else "new"
+
+        logger.info(f"Dedup check completed: {state['dedup_status']}")
+        return state
+
+    except Exception as e:
+        logger.error(f"Dedup check failed, ingesting in full: {str(e)}")
+        state["previous_content_hash"] = None
+        state["replace_previous"] = False
+        state["dedup_status"] = "failed"
+        return state
+
+
 async def parser_agent(state: State) -> State:
         """Main extraction method"""
         logger.info(f"Starting Parser Agent.")
@@ -78,14 +143,24 @@ async def parser_agent(state: State) -> State:
             return state
         
         try:
-            result = await asyncio.to_thread(
-                extractor,
-                input_path=file_path
-            )
+            from app.services.concurrency import stage_limits
+
+            async with stage_limits.extraction:
+                result = await asyncio.to_thread(
+                    extractor,
+                    input_path=file_path
+                )
 
             # Update the existing state object instead of returning a new one
             state["doc_text"] = result.get("text")
             state["extraction_method"] = result.get("method")
+
+            # Page start offsets in doc_text, which joins the pages with newlines
+            offsets, position = [], 0
+            for page_text in result.get("pages") or []:
+                offsets.append(position)
+                position += len(page_text) + 1
+            state["doc_page_offsets"] = offsets
             state["extraction_status"] = "success"
 
             logger.info(f"Extraction completed for file: {file_path}")
@@ -110,10 +185,28 @@ async def chunking_node(state: State) -> State:
         return state
 
     try:
-        from app.services.chunker import chunk  # Import here to avoid circular dependency
-
-        chunks = await chunk(doc_text)
-        state["doc_chunks"] = chunks
+        from app.services.chunker import chunk_blocks  # Import here to avoid circular dependency
+
+        from app.services.document_index import hash_text
+
+        # Chunk page by page when the extractor reported pages
+        offsets = state.get("doc_page_offsets") or []
+        if offsets:
+            bounds = offsets[1:] + [len(doc_text) + 1]
+            blocks = [
+                {"text": doc_text[start:end - 1], "page": num}
+                for num, (start, end) in enumerate(zip(offsets, bounds), start=1)
+            ]
+        else:
+            blocks = [{"text": doc_text, "page": None}]
+
+        chunks = await chunk_blocks(blocks)
+        state["doc_chunks"] = [c["text"] for c in chunks]
+        state["doc_chunk_meta"] = [
+            {key: c[key] for key in ("page_start", "page_end", "char_start", "char_end")}
+            for c in chunks
+        ]
+        state["doc_chunk_hashes"] = [hash_text(c["text"]) for c in chunks]
         state["chunking_status"] = "success"
 
         logger.info(f"Chunking completed. Total chunks created: {len(chunks)}")
@@ -124,7 +217,12 @@ async def chunking_node(state: State) -> State:
         state["chunking_status"] = "failed"
         return state
     
-async def embedding_node(state: State) -> State:
+def run_id(state: State, config: RunnableConfig) -> str:
+    """Identify the graph run that artifacts belong to"""
+    return str(config.get("configurable", {}).get("thread_id") or state.get("content_hash") or state.get("file_path"))
+
+
+async def embedding_node(state: State, config: RunnableConfig) -> State:
     """Node to create embeddings for document chunks."""
     logger.info("Starting Embedding Node.")
 
@@ -135,14 +233,50 @@ async def embedding_node(state: State) -> State:
         return state
 
     try:
-        from app.services.embeddings import embed_text  # Import here to avoid circular dependency
+        from app.services.embeddings import embed_passages, merge_vectors  # Import here to avoid circular dependency
+        from app.services.document_index import document_index
+        from app.services.artifact_store import artifact_store
+        from app.services.qdrant_client import qdrant_manager
+
+        # Chunks unchanged since the earlier document under this filename
+        reusable = defaultdict(list)
+        previous_content_hash = state.get("previous_content_hash")
+        if previous_content_hash:
+            for row in await document_index.get_chunks(previous_content_hash):
+                reusable[row["chunk_hash"]].append(row["point_id"])
 
-        # Create embeddings for each chunk asynchronously
-        embeddings = await asyncio.gather(*(embed_text(chunk) for chunk in doc_chunks))
-        state["doc_embeddings"] = embeddings
+        reused_point_ids = [
+            reusable[chunk_hash].pop() if reusable[chunk_hash] else None
+            for chunk_hash in state["doc_chunk_hashes"]
+        ]
+
+        # A replaced document hands its points over; an earlier document that
+        # stays keeps them, and only their vectors are copied into new points
+        copied = [None] * len(doc_chunks)
+        if not state.get("replace_previous") and any(reused_point_ids):
+            vectors = await qdrant_manager.get_vectors([point_id for point_id in reused_point_ids if point_id])
+            copied = [vectors.get(point_id) if point_id else None for point_id in reused_point_ids]
+            reused_point_ids = [None] * len(doc_chunks)
+
+        new_chunks = [
+            c for c, point_id, vector in zip(doc_chunks, reused_point_ids, copied)
+            if point_id is None and vector is None
+        ]
+
+        # Create embeddings for new chunks in length-sorted batches; the matrix
+        # stays out of the checkpointed state, which only holds its reference
+        embeddings = await embed_passages(new_chunks)
+        if any(vector is not None for vector in copied):
+            embeddings = merge_vectors(embeddings, copied)
+        state["doc_embeddings_ref"] = artifact_store.put(run_id(state, config), "embeddings", embeddings)
+        state["doc_embedding_count"] = len(embeddings)
+        state["reused_point_ids"] = reused_point_ids
         state["embedding_status"] = "success"
 
-        logger.info(f"Embedding completed. Total embeddings created: {len(embeddings)}")
+        logger.info(
+            f"Embedding completed. Total embeddings created: {len(new_chunks)}, "
+            f"reused: {len(doc_chunks) - len(new_chunks)}"
+        )
         return state
 
     except Exception as e:
@@ -154,36 +288,98 @@ async def store_embeddings_node(state: State) -> State:
     """Node to store document embeddings in Qdrant."""
     logger.info("Starting Store Embeddings Node.")
 
-    doc_embeddings = state.get("doc_embeddings")
+    from app.services.artifact_store import artifact_store  # Import here to avoid circular dependency
+
+    doc_embeddings = artifact_store.pop(state.get("doc_embeddings_ref"))
     doc_chunks = state.get("doc_chunks")
     file_path = state.get("file_path")
     file_category = state.get("predicted_category")
     original_filename = state.get("original_filename")
+    content_hash = state.get("content_hash")
+    # Only a document being replaced gives up its points and index record
+    previous_content_hash = state.get("previous_content_hash") if state.get("replace_previous") else None
 
-    if not doc_embeddings or not doc_chunks:
+    if not doc_chunks:
         logger.warning("No embeddings or chunks available for storage.")
         state["storage_status"] = "failed"
         return state
 
-    if len(doc_embeddings) != len(doc_chunks):
+    reused_point_ids = state.get("reused_point_ids") or [None] * len(doc_chunks)
+    doc_chunk_meta = state.get("doc_chunk_meta") or [{}] * len(doc_chunks)
+    new_indices = [idx for idx, point_id in enumerate(reused_point_ids) if point_id is None]
+
+    if doc_embeddings is None:
+        if new_indices:
+            logger.error("Embeddings of this run are no longer available.")
+            state["storage_status"] = "failed"
+            return state
+        doc_embeddings = []
+
+    if len(doc_embeddings) != len(new_indices):
         logger.error("Mismatch between number of embeddings and chunks.")
         state["storage_status"] = "failed"
         return state
 
     try:
-        from app.services.qdrant_client import qdrant_manager
-
-        # Prepare payloads and save each embedding with its corresponding chunk
-        for idx, (embedding, chunk) in enumerate(zip(doc_embeddings, doc_chunks)):
-            payload = {
+        from app.services.qdrant_client import qdrant_manager, ingestion_timestamp
+        from app.services.document_index import document_index
+        from app.services.answer_cache import answer_cache
+
+        # Prepare payloads and save new embeddings in batched upserts
+        ingested_at = ingestion_timestamp()
+        payloads = [
+            {
                 "file_category": file_category,
                 "file_path": file_path,
                 "original_filename": original_filename,
+                "ingested_at": ingested_at,
                 "chunk_index": idx,
-                "chunk_text": chunk
+                "chunk_text": chunk,
+                **meta,
             }
-            await qdrant_manager.save_embedding(embedding=embedding, payload=payload)
-            logger.debug(f"Stored embedding for chunk {idx}")
+            for idx, (chunk, meta) in enumerate(zip(doc_chunks, doc_chunk_meta))
+        ]
+        new_point_ids = await qdrant_manager.save_embeddings(
+            embeddings=doc_embeddings,
+            payloads=[payloads[idx] for idx in new_indices],
+        )
+
+        # Reused points only need their payload refreshed
+        await qdrant_manager.set_payloads({
+            point_id: payloads[idx]
+            for idx, point_id in enumerate(reused_point_ids) if point_id
+        })
+
+        point_ids = list(reused_point_ids)
+        for idx, point_id in zip(new_indices, new_point_ids):
+            point_ids[idx] = point_id
+
+        # Drop points of the replaced document that were not reused
+        if previous_content_hash:
+            kept = set(point_ids)
+            stale = [
+                row["point_id"] for row in await document_index.get_chunks(previous_content_hash)
+                if row["point_id"] not in kept
+            ]
+            await qdrant_manager.delete_points(stale)
+
+        if content_hash:
+            await document_index.save_document(
+                content_hash=content_hash,
+                file_path=file_path,
+                original_filename=original_filename,
+                file_category=file_category,
+                doc_text=state.get("doc_text"),
+                chunks=[
+                    {"chunk_hash": chunk_hash, "point_id": point_id, "chunk_text": chunk}
+                    for chunk_hash, point_id, chunk in zip(state["doc_chunk_hashes"], point_ids, doc_chunks)
+                ],
+            )
+            if previous_content_hash:
+                await document_index.delete_document(previous_content_hash)
+
+        # Cached chat answers may be grounded on the previous version
+        await answer_cache.invalidate_documents([original_filename])
 
         state["storage_status"] = "success"
         logger.info(f"All embeddings stored successfully for file: {file_path}")
@@ -194,55 +390,123 @@ async def store_embeddings_node(state: State) -> State:
         state["storage_status"] = "failed"
         return state
         
+async def predict_category(doc_text: str) -> str:
+    """Predict the category of a document from its leading text using LLM."""
+    from app.utils.helpers import get_chat_model  # Import here to avoid circular dependency
+
+    trimmed_text = doc_text if len(doc_text) <= 5000 else doc_text[:5000]
+
+    model = get_chat_model()
+
+    system_prompt = f"""
+    You are a document classifier. Given the document content, return only the most appropriate category name from the following list:
+
+    {', '.join(settings.CATEGORY_LIST)}
+
+    Return ONLY the category name. Do not include any explanation, formatting, or additional words.
+
+    Example Output:
+    Technical
+
+    Document content:
+
+    {trimmed_text}
+    """
+    messages = [
+        SystemMessage(content=system_prompt),
+    ]
+
+    from app.services.concurrency import stage_limits
+
+    # call LLM
+    async with stage_limits.llm:
+        response = await model.ainvoke(messages)
+    return response.content.strip()
+
+
 async def predict_category_node(state: State) -> State:
     """Node to predict document category using LLM."""
     logger.info("Starting Predict Category Node.")
 
     doc_text = state.get("doc_text")
-    trimmed_text = doc_text if len(doc_text) <= 5000 else doc_text[:5000]
-    if not trimmed_text:
+    if not doc_text or not doc_text.strip():
         logger.warning("No document text available for category prediction.")
         state["category_prediction_status"] = "failed"
         return state
 
     try:
-        from app.utils.helpers import get_chat_model  # Import here to avoid circular dependency
-
-        model = get_chat_model()
+        category = await predict_category(doc_text)
 
-        system_prompt = f"""
-        You are a document classifier. Given the document content, return only the most appropriate category name from the following list:
+        state["predicted_category"] = category
+        state["category_prediction_status"] = "success"
 
-        {', '.join(settings.CATEGORY_LIST)}
+        logger.info(f"Category prediction completed: {category}")
+        return state
 
-        Return ONLY the category name. Do not include any explanation, formatting, or additional words.
+    except Exception as e:
+        logger.error(f"Category prediction failed: {str(e)}")
+        state["category_prediction_status"] = "failed"
+        return state
 
-        Example Output:
-        Technical
 
-        Document content:
+async def streaming_ingest_node(state: State) -> State:
+    """Node to extract, chunk, embed and store a document as a stream of blocks."""
+    logger.info("Starting Streaming Ingest Node.")
 
-        {trimmed_text}
-        """
-        messages = [
-            SystemMessage(content=system_prompt),
-        ]
+    file_path = state.get("file_path")
+    original_filename = state.get("original_filename")
+    content_hash = state.get("content_hash")
+    previous_content_hash = state.get("previous_content_hash")
 
-        try:
-            # call LLM
-            response = await model.ainvoke(messages)
-        except Exception as e:
-            logger.error(f"Error in doc_analyzer_node LLM call: {e}")
+    block_iterator = get_block_iterator(file_path)
+    if not block_iterator:
+        logger.warning(f"No extractor available for file: {file_path}")
+        state["extraction_status"] = "failed"
+        return state
 
-        category = response.content.strip()
+    try:
+        from app.services.document_index import document_index
+        from app.services.answer_cache import answer_cache
+        from app.services.ingestion_pipeline import StreamingIngestion
+
+        # Chunks unchanged since the earlier document under this filename
+        reusable = defaultdict(list)
+        if previous_content_hash:
+            for row in await document_index.get_chunks(previous_content_hash):
+                reusable[row["chunk_hash"]].append(row["point_id"])
+
+        replace_previous = bool(state.get("replace_previous"))
+        pipeline = StreamingIngestion(
+            file_path, original_filename, reusable_points=reusable, replace=replace_previous
+        )
+        await pipeline.run(block_iterator(input_path=file_path), categorize=predict_category)
+
+        state["extraction_method"] = "+".join(sorted(pipeline.extraction_methods))
+        for status in ("extraction_status", "chunking_status", "embedding_status", "storage_status"):
+            state[status] = "success"
+        state["predicted_category"] = pipeline.category
+        state["category_prediction_status"] = "success" if pipeline.category else "failed"
+
+        if content_hash:
+            # Text is not kept in streaming mode, only chunk hashes and point ids
+            await document_index.save_document(
+                content_hash=content_hash,
+                file_path=file_path,
+                original_filename=original_filename,
+                file_category=pipeline.category,
+                doc_text=None,
+                chunks=pipeline.rows,
+            )
+            if previous_content_hash and replace_previous:
+                await document_index.delete_document(previous_content_hash)
 
-        state["predicted_category"] = category
-        state["category_prediction_status"] = "success"
+        # Cached chat answers may be grounded on the previous version
+        await answer_cache.invalidate_documents([original_filename])
 
-        logger.info(f"Category prediction completed: {category}")
+        logger.info(f"Streaming ingestion completed for file: {file_path}")
         return state
 
     except Exception as e:
-        logger.error(f"Category prediction failed: {str(e)}")
-        state["category_prediction_status"] = "failed"
-        return state
\ No newline at end of file
+        logger.error(f"Streaming ingestion failed for {file_path}: {str(e)}")
+        state["storage_status"] = "failed"
+        return state
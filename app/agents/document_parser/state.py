@@ -1,4 +1,4 @@
-from typing import TypedDict, List
+from typing import TypedDict, List, Optional
 
 class State(TypedDict):
     # default field
@@ -7,15 +7,28 @@ class State(TypedDict):
     file_path: str
     original_filename: str
     file_save_status: str
+    # run options
+    streaming: bool
+    replace: bool  # replace the latest document uploaded under the same filename
+    # deduplication fields
+    content_hash: str
+    previous_content_hash: str
+    replace_previous: bool
+    dedup_status: str
     # extraction fields
     doc_text: str
     extraction_method: str
+    doc_page_offsets: List[int]
     extraction_status: str
     # chunking fields
     doc_chunks: List[str]
+    doc_chunk_hashes: List[str]
+    doc_chunk_meta: List[dict]
     chunking_status: str
     # embedding fields
-    doc_embeddings: List[List[float]]
+    doc_embeddings_ref: str  # artifact store reference, the matrix is not checkpointed
+    doc_embedding_count: int
+    reused_point_ids: List[Optional[str]]
     embedding_status: str
     # analysis fields
     storage_status: str
@@ -1,15 +1,17 @@
 from .docs import extract_docx_text
-from .excel import extract_excel_text
+from .excel import extract_excel_text, iter_excel_blocks
 from .image import extract_image_text
-from .pdf import extract_pdf_text 
+from .pdf import extract_pdf_text, iter_pdf_blocks
 from .easy_ocr import easyocr_extractor
 from .arabic import extract_arabic_with_tesseract
 
 __all__ = [
     "extract_docx_text",
     "extract_excel_text",
+    "iter_excel_blocks",
     "extract_image_text",
     "extract_pdf_text",
+    "iter_pdf_blocks",
     "easyocr_extractor",
     "extract_arabic_with_tesseract"
 ]
\ No newline at end of file
@@ -1,16 +1,19 @@
-import pytesseract
-from pdf2image import convert_from_path
-import os
-import sys
+import time
+
+from app.services.ocr import ocr_pdf_pages
+
+from app.utils.logger import get_logger
+logger = get_logger(__name__)
 
-# Set the path to the tesseract executable (only needed if it's not in your system's PATH)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
 def extract_arabic_with_tesseract(input_path: str):
-    images = convert_from_path(input_path, dpi=300)
-    text = ""
-    for img in images:
-        text += pytesseract.image_to_string(img, lang="ara") + "\n"
+    """Extract text from a scanned PDF, OCR-ing pages in parallel with Tesseract"""
+    start_time = time.perf_counter()
+
+    pages = ocr_pdf_pages(input_path)
+    text = "\n".join(pages)
+
+    logger.info(f"OCR of {len(pages)} pages took {time.perf_counter() - start_time:.2f} seconds")
     return {
             "method": "ocr",
             "word_count": len(text.split()),
@@ -1,14 +1,25 @@
 from typing import Dict, Union
-from easyocr import Reader
 import numpy as np
 from PIL import Image
 from langsmith import traceable
 
 from app.core.settings import settings
+from app.services.model_registry import model_registry
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
-reader = Reader(settings.EASYOCR_LANGUAGES, gpu=False)  # Initialize once, use CPU
+
+def load_reader():
+    """Build the EasyOCR reader (CPU); easyocr pulls in torch, so it is imported here"""
+    from easyocr import Reader
+    return Reader(settings.EASYOCR_LANGUAGES, gpu=False)
+
+
+# Initialize once on first use, only ingestion needs it; in server mode the
+# reader lives in the inference server process
+model_registry.register(
+    "easyocr", load_reader, roles=("ingest",) if settings.INFERENCE_MODE == "local" else ()
+)
 
 @traceable(name="Easy OCR Parser")
 def easyocr_extractor(image: Union[str, Image.Image, np.ndarray]) -> str:
@@ -19,7 +30,11 @@ def easyocr_extractor(image: Union[str, Image.Image, np.ndarray]) -> str:
             # Convert PIL Image to numpy array
             image = np.array(image)
 
-        result = reader.readtext(image, detail=0)  # returns list of strings
+        if settings.INFERENCE_MODE == "server":
+            from app.services.inference_server import inference_client  # Import here to avoid circular dependency
+            return inference_client.ocr(image)
+
+        result = model_registry.get("easyocr").readtext(image, detail=0)  # returns list of strings
         text = "\n".join(result)
         return text.strip()
     
@@ -1,32 +1,177 @@
+import os
+import time
+from datetime import date, datetime, time as dt_time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 from openpyxl import load_workbook
-from typing import Dict
+
+from app.core.settings import settings
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 from langsmith import traceable
 
+
+def format_cell(value: Any) -> str:
+    """Render a cell value as text; empty cells become an empty string"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        # Line breaks inside a cell would split its row
+        return " ".join(value.split())
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ") if value.time() != dt_time() else value.date().isoformat()
+    if isinstance(value, (date, dt_time)):
+        return value.isoformat()
+    return str(value)
+
+
+def is_header(cells: List[str]) -> bool:
+    """A row of at least two text cells, none of them a number, reads as a header"""
+    filled = [cell for cell in cells if cell]
+    return len(filled) >= 2 and not any(_is_number(cell) for cell in filled)
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text.replace(",", ""))
+        return True
+    except ValueError:
+        return False
+
+
+def format_row(cells: List[str], header: Optional[List[str]]) -> str:
+    """Serialize a row as "Column: value" pairs so it reads on its own in a chunk"""
+    parts = []
+    for idx, cell in enumerate(cells):
+        if not cell:
+            continue
+        name = header[idx] if header and idx < len(header) else ""
+        parts.append(f"{name}: {cell}" if name else cell)
+    return " | ".join(parts)
+
+
+def _iter_xlsx_rows(input_path: str) -> Iterator[Tuple[str, int, tuple]]:
+    """Stream (sheet, row number, values) from an .xlsx workbook in read-only mode"""
+    workbook = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            # The stored dimensions can be stale and would cut rows off; read to the end instead
+            sheet.reset_dimensions()
+            for number, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                yield sheet.title, number, values
+    finally:
+        # Read-only workbooks keep the file open until closed
+        workbook.close()
+
+
+def _iter_xls_rows(input_path: str) -> Iterator[Tuple[str, int, tuple]]:
+    """Stream (sheet, row number, values) from a legacy .xls workbook with xlrd"""
+    try:
+        import xlrd
+    except ImportError as e:
+        raise ImportError("Reading .xls files needs the 'xlrd' package") from e
+
+    # on_demand loads one sheet at a time
+    workbook = xlrd.open_workbook(input_path, on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            for number in range(sheet.nrows):
+                values = []
+                for cell in sheet.row(number):
+                    if cell.ctype == xlrd.XL_CELL_DATE:
+                        values.append(xlrd.xldate.xldate_as_datetime(cell.value, workbook.datemode))
+                    elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                        values.append(bool(cell.value))
+                    elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                        values.append(None)
+                    else:
+                        values.append(cell.value)
+                yield sheet.name, number + 1, values
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def iter_sheet_rows(input_path: str) -> Iterator[Tuple[str, int, tuple]]:
+    """Stream the rows of a workbook, choosing the reader by file extension"""
+    if os.path.splitext(input_path)[1].lower() == ".xls":
+        return _iter_xls_rows(input_path)
+    return _iter_xlsx_rows(input_path)
+
+
+def iter_excel_blocks(input_path: str, rows_per_block: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Yield blocks of at most `rows_per_block` rows, never spanning two sheets.
+    Each block starts with a "## sheet (rows a-b)" heading so chunks break at
+    sheet and row-range boundaries, and each row is serialized with the
+    sheet's header row so it stays understandable on its own.
+    """
+    logger.info(f"Streaming excel file...")
+    rows_per_block = rows_per_block or settings.EXCEL_ROWS_PER_BLOCK
+
+    sheet_name, header = None, None
+    lines: List[str] = []
+    first_row = last_row = 0
+
+    def _block() -> Dict:
+        heading = f"## {sheet_name} (rows {first_row}-{last_row})"
+        return {"page": None, "sheet": sheet_name, "text": "\n".join([heading, *lines])}
+
+    for name, number, values in iter_sheet_rows(input_path):
+        if name != sheet_name:
+            if lines:
+                yield _block()
+            sheet_name, header, lines = name, None, []
+
+        cells = [format_cell(value) for value in values]
+        if not any(cells):
+            continue
+
+        # Rows above the first multi-column row (titles, notes) are kept as
+        # they are; that row is the header if it looks like one
+        if header is None and sum(1 for cell in cells if cell) >= 2:
+            header = cells if is_header(cells) else []
+            if header:
+                continue
+
+        if not lines:
+            first_row = number
+        lines.append(format_row(cells, header))
+        last_row = number
+
+        if len(lines) >= rows_per_block:
+            yield _block()
+            lines = []
+
+    if lines:
+        yield _block()
+
+
 @traceable(name="Excel Parser")
 def extract_excel_text(input_path: str) -> Dict:
     """Extract text from Excel files"""
     logger.info(f"Extracting excel file...")
     try:
-        wb = load_workbook(input_path)
-        text = ""
-        
-        for sheet in wb:
-            for row in sheet.iter_rows(values_only=True):
-                text += " ".join(str(cell) for cell in row if cell) + "\n"
-        
-        logger.debug(f"Extracted text: {text}")
-        
-        # with open(output_path, 'w', encoding='utf-8') as f:
-        #     f.write(text)
-            
+        start_time = time.perf_counter()
+
+        # Blank lines keep each block heading on its own for the chunker
+        text = "\n\n".join(block["text"] for block in iter_excel_blocks(input_path))
+        method = "xlrd" if input_path.lower().endswith(".xls") else "openpyxl"
+
+        total_time = time.perf_counter() - start_time
+        logger.info(f"Excel extraction ({method}) took {total_time:.2f} seconds")
+
         return {
-            "method": "openpyxl",
+            "method": method,
             "word_count": len(text.split()),
             "text": text
         }
     except Exception as e:
-        raise Exception(f"Excel extraction failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Excel extraction failed: {str(e)}")
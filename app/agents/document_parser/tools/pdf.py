@@ -1,53 +1,126 @@
-from pdfminer.high_level import extract_text
-from pdf2image import convert_from_path
-from typing import Dict
-import os
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from collections import deque
+from typing import Dict, Iterator, List
+import re
 import time
+import unicodedata
 
 from langsmith import traceable
 
-# import pytesseract from tesseract_config.py to use configured path
-# from app.config.tesseract_config import pytesseract
-from app.agents.document_parser.tools.easy_ocr import easyocr_extractor
+from app.core.settings import settings
+from app.services.ocr import ocr_pdf_pages, get_page_count, submit_ocr_page, ocr_worker_count
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
+# Glyphs pdfminer emits when a font has no usable unicode mapping
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+ARABIC_PATTERN = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]")
+LATIN_PATTERN = re.compile(r"[A-Za-z\u00C0-\u024F0-9\u0660-\u0669]")
+GARBAGE_PATTERN = re.compile(r"[\uFFFD\uE000-\uF8FF\x00-\x08\x0B\x0C\x0E-\x1F]")
+
+
+def iter_page_texts(input_path: str) -> Iterator[str]:
+    """
+    Lazily extract the text layer of each page with pdfminer.
+    If pdfminer fails, the remaining pages are yielded empty so they get OCR-ed.
+    """
+    count = 0
+    try:
+        for layout in extract_pages(input_path):
+            text = "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+            count += 1
+            # NFKC folds Arabic presentation forms back to base letters
+            yield unicodedata.normalize("NFKC", text)
+    except Exception as e:
+        logger.warning(f"Text layer extraction failed after {count} pages, using OCR for the rest: {str(e)}")
+        for _ in range(count, get_page_count(input_path)):
+            yield ""
+
+
+def has_usable_text_layer(text: str) -> bool:
+    """
+    Decide whether a page's text layer can be used as-is:
+    - enough visible characters,
+    - few undecodable glyphs (cid codes, replacement or private-use chars),
+    - mostly Arabic/Latin letters and digits.
+    """
+    cid_count = len(CID_PATTERN.findall(text))
+    text = CID_PATTERN.sub("", text)
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < settings.PDF_MIN_PAGE_CHARS:
+        return False
+
+    garbage = cid_count + len(GARBAGE_PATTERN.findall(text))
+    if garbage / (len(chars) + cid_count) > settings.PDF_MAX_GARBAGE_RATIO:
+        return False
+
+    script_chars = len(ARABIC_PATTERN.findall(text)) + len(LATIN_PATTERN.findall(text))
+    return script_chars / len(chars) >= settings.PDF_MIN_SCRIPT_RATIO
+
 
 @traceable(name="PDF Parser")
 def extract_pdf_text(input_path: str) -> Dict:
-    """Extract text from PDF, with OCR fallback"""
+    """Extract text from PDF, OCR-ing only the pages without a usable text layer"""
     logger.info(f"Extracting pdf file...")
     try:
-        # First try regular extraction
-        text = extract_text(input_path)
-        
-        # If little text found, try OCR
-        if len(text.strip()) < 100:
-            images = convert_from_path(input_path)
-            text = ""
-            logger.info("Extracting with EasyOCR...")
-            start_time = time.perf_counter()
-            
-            for image in images:
-                text += easyocr_extractor(image) + "\n"
-            method = "pdfminer+ocr"
+        start_time = time.perf_counter()
 
-            total_time = time.perf_counter() - start_time
-            logger.info(f"OCR processing time: {total_time:.2f} seconds")
-        else:
+        pages = list(iter_page_texts(input_path))
+
+        # Route scanned or broken pages to OCR
+        ocr_pages = [num for num, text in enumerate(pages, start=1) if not has_usable_text_layer(text)]
+        if ocr_pages:
+            logger.info(f"OCR needed for {len(ocr_pages)} of {len(pages)} pages")
+            for num, text in zip(ocr_pages, ocr_pdf_pages(input_path, pages=ocr_pages)):
+                pages[num - 1] = text
+
+        if not ocr_pages:
             method = "pdfminer"
+        elif len(ocr_pages) == len(pages):
+            method = "ocr"
+        else:
+            method = "pdfminer+ocr"
 
+        text = "\n".join(pages)
+
+        total_time = time.perf_counter() - start_time
+        logger.info(f"PDF extraction ({method}) took {total_time:.2f} seconds")
         logger.debug(f"Extracted text: {text}")
-        
-        # # Save extracted text
-        # with open(output_path, 'w', encoding='utf-8') as f:
-        #     f.write(text)
-            
+
         return {
             "method": method,
             "word_count": len(text.split()),
-            "text": text
+            "text": text,
+            "pages": pages,
+            "ocr_pages": ocr_pages,
         }
     except Exception as e:
-        raise Exception(f"PDF extraction failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"PDF extraction failed: {str(e)}")
+
+
+def iter_pdf_blocks(input_path: str) -> Iterator[Dict]:
+    """
+    Yield one block per page, in page order, as soon as it is available.
+    Pages without a usable text layer are OCR-ed in the background while
+    later pages are read; the lookahead is bounded by the OCR worker count.
+    """
+    logger.info(f"Streaming pdf file...")
+    lookahead = ocr_worker_count()
+    pending = deque()
+
+    def _resolve(num, text, future):
+        return {"page": num, "text": future.result() if future else text, "ocr": future is not None}
+
+    for num, text in enumerate(iter_page_texts(input_path), start=1):
+        if has_usable_text_layer(text):
+            pending.append((num, text, None))
+        else:
+            pending.append((num, None, submit_ocr_page(input_path, num)))
+
+        while pending and (pending[0][2] is None or pending[0][2].done() or len(pending) > lookahead):
+            yield _resolve(*pending.popleft())
+
+    while pending:
+        yield _resolve(*pending.popleft())
@@ -1,26 +1,55 @@
 from langgraph.graph import END, START, StateGraph
 
 from app.agents.rag_chat.nodes import (
-    rag_assistant_node
+    rag_assistant_node,
+    retrieve_node,
+    generate_node,
+    cache_lookup_node,
+    cache_store_node,
+    is_small_talk
 )
 
 from app.agents.rag_chat.state import State
+from app.core.settings import settings
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
+def route_query(state: State) -> str:
+    """Pick the answer cache, the ReAct agent or the retrieve-then-generate path for a query"""
+    if state.get("answer_cache_status") == "hit":
+        return END
+    mode = state.get("mode") or settings.RAG_MODE
+    if mode != "direct":
+        return "RAGAssistantNode"
+    if is_small_talk(state.get("query", "")):
+        # Small talk is answered without retrieval
+        return "GenerateNode"
+    return "RetrieveNode"
+
+
 async def rag_chat_graph(checkpointer) -> StateGraph:
 
     graph_builder = StateGraph(State)
 
     # Add all nodes
+    graph_builder.add_node("CacheLookupNode", cache_lookup_node)
     graph_builder.add_node("RAGAssistantNode", rag_assistant_node)
+    graph_builder.add_node("RetrieveNode", retrieve_node)
+    graph_builder.add_node("GenerateNode", generate_node)
+    graph_builder.add_node("CacheStoreNode", cache_store_node)
 
     # Define workflow
-    graph_builder.add_edge(START, "RAGAssistantNode")
-    graph_builder.add_edge("RAGAssistantNode", END)
+    graph_builder.add_edge(START, "CacheLookupNode")
+    graph_builder.add_conditional_edges(
+        "CacheLookupNode", route_query, ["RAGAssistantNode", "RetrieveNode", "GenerateNode", END]
+    )
+    graph_builder.add_edge("RAGAssistantNode", "CacheStoreNode")
+    graph_builder.add_edge("RetrieveNode", "GenerateNode")
+    graph_builder.add_edge("GenerateNode", "CacheStoreNode")
+    graph_builder.add_edge("CacheStoreNode", END)
 
     return graph_builder.compile(
         name="RAGChatGraph",
         checkpointer=checkpointer
-    )
\ No newline at end of file
+    )
@@ -1,19 +1,58 @@
 import os
+import re
 import json
 import asyncio
 
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langgraph.prebuilt import create_react_agent
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, RemoveMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 
 from app.core.settings import settings
 from app.agents.rag_chat.state import State
-from app.agents.rag_chat.tools import vector_search
-from app.utils.helpers import get_chat_model
-from app.agents.rag_chat.prompts import SYSTEM_PROMPT
+from app.agents.rag_chat.tools import vector_search, search_documents, get_search_filters, format_context
+from app.utils.helpers import get_react_agent, get_chat_model
+from app.agents.rag_chat.prompts import SYSTEM_PROMPT, RETRIEVAL_SYSTEM_PROMPT
+from app.services.answer_cache import answer_cache
+from app.services.embeddings import embed_query
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
+# Greetings, thanks and other small talk that never needs retrieval
+SMALL_TALK_PATTERN = re.compile(
+    r"^(hi|hello|hey|good (morning|afternoon|evening)|thanks?( you)?|thank you( very much)?|ok(ay)?|bye|goodbye"
+    r"|how are you|مرحبا|اهلا|أهلا|السلام عليكم|صباح الخير|مساء الخير|شكرا|شكراً|كيف حالك|مع السلامة)"
+    r"[\s!.,?؟،]*$",
+    re.IGNORECASE,
+)
+
+
+def is_small_talk(query: str) -> bool:
+    """Cheap check for messages that can be answered without retrieval."""
+    return bool(SMALL_TALK_PATTERN.match(query.strip()))
+
+
+def trim_history(state: State):
+    """Split the conversation into the recent turns to keep and removals for the rest."""
+    history = list(state.get("messages", []))
+    overflow = max(len(history) + 2 - settings.CHAT_HISTORY_MAX_MESSAGES, 0)
+    return history[overflow:], [RemoveMessage(id=m.id) for m in history[:overflow]]
+
+
+def build_references(payloads: list) -> list:
+    """Turn retrieved chunk payloads into one reference per source file."""
+    references = {}
+    for payload in payloads:
+        file_path = payload.get("file_path")
+        if file_path and file_path not in references:
+            references[file_path] = {
+                "file_name": payload.get("original_filename"),
+                "file_path": file_path,
+                "file_category": payload.get("file_category"),
+                "snippet": (payload.get("chunk_text") or "")[:200],
+            }
+    return list(references.values())
+
+
 async def rag_assistant_node(state: State) -> State:
     """Node to handle RAG chat assistant logic."""
     logger.info("Starting RAG Chat Assistant Node.")
@@ -25,18 +64,18 @@ async def rag_assistant_node(state: State) -> State:
         return state
 
     try:
-        model = get_chat_model()
-        # Define tools
-        tools = [vector_search]
-        # Create ReAct agent
-        react_agent = create_react_agent(model, tools=tools)
+        # Shared ReAct agent for this model and tool set
+        react_agent = get_react_agent(tools=[vector_search])
 
         system_prompt = SYSTEM_PROMPT
 
+        # Keep only the most recent turns of the conversation
+        history, removals = trim_history(state)
+
         # Build message sequence
         messages = [
             SystemMessage(content=system_prompt),
-            *state["messages"],  # previous conversation (history)
+            *history,  # previous conversation (history)
             HumanMessage(content=state.get("query"))
         ]
 
@@ -47,17 +86,158 @@ async def rag_assistant_node(state: State) -> State:
         if response:
             content = response["messages"][-1].content
             state['response'] = content
+
+            # Sources come from the artifacts of this turn's vector searches
+            payloads = [
+                payload
+                for message in response["messages"] if isinstance(message, ToolMessage)
+                for payload in (message.artifact or [])
+            ]
+            state["references"] = build_references(payloads)
             # Create new messages to append
             new_human_message = HumanMessage(content=state["query"])
             new_ai_message = AIMessage(content=state["response"])
             state["response_status"] = "success"
             return {
                 **state, 
-                'messages': [new_human_message, new_ai_message]
+                'messages': [
+                    *removals,
+                    new_human_message,
+                    new_ai_message
+                ]
             }
         else:
             state["response_status"] = "failed"
             return state
 
     except Exception as e:
-        pass
\ No newline at end of file
+        logger.error(f"RAG assistant failed: {str(e)}")
+        state["references"] = []
+        state["response_status"] = "failed"
+        return state
+
+
+async def retrieve_node(state: State, config: RunnableConfig) -> State:
+    """Node to search the vector database for the query without an agent round trip."""
+    logger.info("Starting Retrieve Node.")
+
+    try:
+        payloads = await search_documents(state.get("query"), filters=get_search_filters(config))
+
+        state["retrieved_doc_texts"] = [p.get("chunk_text", "") for p in payloads]
+        state["retrieved_sources"] = [p.get("original_filename") for p in payloads]
+        state["references"] = build_references(payloads)
+
+        logger.info(f"Retrieved {len(payloads)} chunks.")
+        return state
+
+    except Exception as e:
+        logger.error(f"Retrieval failed: {str(e)}")
+        state["retrieved_doc_texts"] = []
+        state["retrieved_sources"] = []
+        state["references"] = []
+        return state
+
+
+async def generate_node(state: State) -> State:
+    """Node to answer from the retrieved context with a single LLM call."""
+    logger.info("Starting Generate Node.")
+
+    query = state.get("query")
+    if not query:
+        logger.warning("No query provided in state.")
+        state["response_status"] = "failed"
+        return state
+
+    try:
+        model = get_chat_model()
+
+        if state.get("retrieved_doc_texts"):
+            context = format_context([
+                {"original_filename": source, "chunk_text": text}
+                for source, text in zip(state["retrieved_sources"], state["retrieved_doc_texts"])
+            ])
+        else:
+            context = "No document context was retrieved for this message."
+
+        history, removals = trim_history(state)
+
+        messages = [
+            SystemMessage(content=RETRIEVAL_SYSTEM_PROMPT.format(context=context)),
+            *history,
+            HumanMessage(content=query)
+        ]
+
+        response = await model.ainvoke(messages)
+
+        state["response"] = response.content
+        state["response_status"] = "success"
+        return {
+            **state,
+            "messages": [*removals, HumanMessage(content=query), AIMessage(content=response.content)]
+        }
+
+    except Exception as e:
+        logger.error(f"Generation failed: {str(e)}")
+        state["response_status"] = "failed"
+        return state
+
+
+def cache_scope(config: RunnableConfig) -> str:
+    """Answers are only shared between requests with the same search scope."""
+    return json.dumps(get_search_filters(config) or {}, sort_keys=True, default=str)
+
+
+async def cache_lookup_node(state: State, config: RunnableConfig) -> State:
+    """Node to serve a first-turn question from the semantic answer cache."""
+    query = state.get("query")
+
+    # Follow-up questions depend on the conversation, only first turns are cached
+    if not settings.ANSWER_CACHE_ENABLED or not query or state.get("messages"):
+        state["answer_cache_status"] = "skip"
+        return state
+
+    try:
+        # Answers generated on a miss are stored under the generation seen here
+        generation = await answer_cache.current_generation()
+        state["answer_cache_generation"] = generation
+        cached = await answer_cache.lookup(await embed_query(query), generation, scope=cache_scope(config))
+    except Exception as e:
+        logger.error(f"Answer cache lookup failed: {str(e)}")
+        cached = None
+
+    if cached is None:
+        state["answer_cache_status"] = "miss"
+        return state
+
+    logger.info("Answer cache hit.")
+    state["answer_cache_status"] = "hit"
+    state["response"] = cached.answer
+    state["references"] = cached.references
+    state["response_status"] = "success"
+    return {
+        **state,
+        "messages": [HumanMessage(content=query), AIMessage(content=cached.answer)]
+    }
+
+
+async def cache_store_node(state: State, config: RunnableConfig) -> State:
+    """Node to add a freshly generated first-turn answer to the answer cache."""
+    if state.get("answer_cache_status") != "miss" or state.get("response_status") != "success":
+        return state
+    # The lookup could not read the corpus generation
+    if state.get("answer_cache_generation") is None:
+        return state
+
+    try:
+        answer_cache.store(
+            await embed_query(state["query"]),
+            query=state["query"],
+            answer=state.get("response", ""),
+            references=state.get("references", []),
+            generation=state["answer_cache_generation"],
+            scope=cache_scope(config),
+        )
+    except Exception as e:
+        logger.error(f"Answer cache store failed: {str(e)}")
+    return state
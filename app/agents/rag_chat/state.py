@@ -4,8 +4,15 @@ from langgraph.graph.message import add_messages
 
 class State(TypedDict):
     query: str
+    # "react" (agent decides on tool calls) or "direct" (retrieve then generate)
+    mode: str
     retrieved_doc_texts: List[str]
     retrieved_sources: List[str]
+    references: List[dict]
     response: str
     response_status: str
+    # "hit", "miss" or "skip" (not a cacheable first-turn question)
+    answer_cache_status: str
+    # Corpus generation of the cache lookup, a generated answer is stored under it
+    answer_cache_generation: int
     messages: Annotated[Sequence[BaseMessage], add_messages]
\ No newline at end of file
@@ -1,17 +1,46 @@
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
-from app.services.embeddings import embed_text
+from app.core.settings import settings
+from app.services.embeddings import embed_query
 from app.services.qdrant_client import qdrant_manager
+from app.services.reranker import postprocess
+
+
+def get_search_filters(config: Optional[RunnableConfig]) -> Optional[Dict[str, Any]]:
+    """Return the search scope passed by the caller in the run config."""
+    return ((config or {}).get("configurable") or {}).get("search_filters")
+
+
+async def search_documents(query: str, filters: Optional[Dict[str, Any]] = None) -> list:
+    """
+    Embed a query and return the best passages: merged adjacent chunks,
+    optionally reranked, within the context token budget.
+    """
+    query_embedding = await embed_query(query)
+    limit = settings.RERANK_CANDIDATES if settings.RERANKER_ENABLED else None
+    hits = await qdrant_manager.search_embedding(query_embedding, limit=limit, filters=filters, query_text=query)
+    return await postprocess(query, hits)
 
-@tool
-async def vector_search(query: str) -> list:
+
+def format_context(passages: list) -> str:
+    """Compact numbered context for the model: source name and text only."""
+    return "\n\n".join(
+        f"[{idx}] ({p.get('original_filename')}) {p.get('chunk_text', '')}"
+        for idx, p in enumerate(passages, start=1)
+    )
+
+
+@tool(response_format="content_and_artifact")
+async def vector_search(query: str, config: RunnableConfig) -> tuple:
     """Tool to perform vector search in the document embeddings."""
     try:
-        query_embedding = await embed_text(query)
-
-        results = await qdrant_manager.search_embedding(query_embedding)
+        # The scope comes from the request, not from the model
+        results = await search_documents(query, filters=get_search_filters(config))
 
-        # Implement vector search logic here
-        return results
+        # The model only sees the packed context; payloads are kept as the artifact for references
+        return format_context(results) or "No matching documents found.", results
     except Exception as e:
-        return f"Error occurred during vector search: {e}"
\ No newline at end of file
+        return f"Error occurred during vector search: {e}", []
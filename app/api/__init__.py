@@ -1,4 +1,6 @@
 from .upload import router as upload_router
 from .chat import router as chat_router
+from .metrics import router as metrics_router
+from .health import router as health_router
 
-__all__ = ["upload_router", "chat_router"]
\ No newline at end of file
+__all__ = ["upload_router", "chat_router", "metrics_router", "health_router"]
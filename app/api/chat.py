@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import JSONResponse
-
-from langgraph.checkpoint.memory import MemorySaver
-
-from app.agents.rag_chat.graph import rag_chat_graph
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional, Literal, List
+from datetime import datetime
+from uuid import uuid4
+import json
 
+from app.core.settings import settings
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
@@ -16,9 +17,45 @@ from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
     query: str
+    # conversation id; a new one is created when omitted
+    thread_id: Optional[str] = None
+    # "react" or "direct"; defaults to settings.RAG_MODE
+    mode: Optional[Literal["react", "direct"]] = None
+    # search scope; omitted fields do not restrict the search
+    categories: Optional[List[str]] = None
+    filenames: Optional[List[str]] = None
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
 
 router = APIRouter()
 
+
+def new_turn_state(chatrequest: ChatRequest) -> dict:
+    """Initial graph state for a turn; clears per-turn fields left in the checkpoint."""
+    return {
+        "query": chatrequest.query,
+        "mode": chatrequest.mode or settings.RAG_MODE,
+        "retrieved_doc_texts": [],
+        "retrieved_sources": [],
+        "references": [],
+        "response": "",
+        "response_status": "",
+        "answer_cache_generation": None,
+    }
+
+
+def run_config(chatrequest: ChatRequest, thread_id: str) -> dict:
+    """Run config carrying the conversation id and the request's search scope."""
+    filters = {
+        "categories": chatrequest.categories,
+        "filenames": chatrequest.filenames,
+        "ingested_after": int(chatrequest.ingested_after.timestamp()) if chatrequest.ingested_after else None,
+        "ingested_before": int(chatrequest.ingested_before.timestamp()) if chatrequest.ingested_before else None,
+    }
+    filters = {key: value for key, value in filters.items() if value}
+    return {"configurable": {"thread_id": str(thread_id), "search_filters": filters or None}}
+
+
 @router.post("/chat")
 async def chat_answer(
     request:Request,
@@ -27,26 +64,25 @@ async def chat_answer(
 
     """Handle chat requests."""
     logger.info("Received chat request.")
-    
 
-    # static for now
-    thread_id = "upload"
+    thread_id = chatrequest.thread_id or uuid4().hex
 
-    config = {"configurable": {"thread_id": str(thread_id)}}
+    config = run_config(chatrequest, thread_id)
 
-    memory = MemorySaver() 
+    initial_state = new_turn_state(chatrequest)
 
-    initial_state = {
-        "query": chatrequest.query,
-    }
-
-    graph = await rag_chat_graph(checkpointer=memory)
+    # Compiled once at startup
+    graph = request.app.state.rag_chat_graph
 
     response = await graph.ainvoke(
         initial_state,
         config=config,
     )  
 
+    # The answer of a failed turn must not be mistaken for an empty one
+    if response.get("response_status") == "failed":
+        raise HTTPException(status_code=502, detail="Failed to generate an answer")
+
     # Extract content properly
     answer = response.get("response", "")
 
@@ -55,5 +91,87 @@ async def chat_answer(
 
     return JSONResponse(content={
         "answer": answer,
-        "references": references
-    })
\ No newline at end of file
+        "references": references,
+        "thread_id": thread_id,
+    })
+
+
+# (graph node, node running the model) pairs whose model output is the answer;
+# the ReAct agent is a subgraph of RAGAssistantNode with its model in "agent"
+ANSWER_MODEL_NODES = {("GenerateNode", "GenerateNode"), ("RAGAssistantNode", "agent")}
+
+
+def is_answer_token(event: dict) -> bool:
+    """Whether a chat model stream event is a token of the answer, not of a tool call or another model call"""
+    metadata = event.get("metadata") or {}
+    graph_node = metadata.get("langgraph_checkpoint_ns", "").split(":", 1)[0]
+    if (graph_node, metadata.get("langgraph_node")) not in ANSWER_MODEL_NODES:
+        return False
+    chunk = event["data"]["chunk"]
+    return not chunk.tool_call_chunks and bool(chunk.content) and isinstance(chunk.content, str)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: Request,
+    chatrequest: ChatRequest,
+):
+    """
+    Stream a chat answer over Server-Sent Events:
+    thread -> tool_start/tool_end (react) or retrieval (direct) and token events
+    -> references -> done, or an error event when the turn fails.
+    """
+    logger.info("Received streaming chat request.")
+
+    thread_id = chatrequest.thread_id or uuid4().hex
+    config = run_config(chatrequest, thread_id)
+
+    initial_state = new_turn_state(chatrequest)
+
+    graph = request.app.state.rag_chat_graph
+
+    async def event_stream():
+        yield _sse("thread", {"thread_id": thread_id})
+
+        try:
+            async for event in graph.astream_events(initial_state, config=config, version="v2"):
+                kind = event["event"]
+
+                if kind == "on_chat_model_stream":
+                    if is_answer_token(event):
+                        yield _sse("token", {"content": event["data"]["chunk"].content})
+
+                elif kind == "on_chain_end" and event["name"] == "RetrieveNode":
+                    output = event["data"].get("output") or {}
+                    yield _sse("retrieval", {"results": len(output.get("retrieved_doc_texts", []))})
+
+                elif kind == "on_tool_start":
+                    yield _sse("tool_start", {"name": event["name"], "input": event["data"].get("input")})
+
+                elif kind == "on_tool_end":
+                    output = event["data"].get("output")
+                    artifact = getattr(output, "artifact", None) or []
+                    yield _sse("tool_end", {"name": event["name"], "results": len(artifact)})
+
+            state = await graph.aget_state(config)
+            if state.values.get("response_status") == "failed":
+                yield _sse("error", {"detail": "Failed to generate an answer"})
+                return
+
+            yield _sse("references", {"references": state.values.get("references", [])})
+            yield _sse("done", {"answer": state.values.get("response", ""), "thread_id": thread_id})
+
+        except Exception as e:
+            logger.error(f"Streaming chat failed: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
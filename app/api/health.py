@@ -0,0 +1,43 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.settings import settings
+from app.services.model_registry import model_registry
+from app.services.qdrant_client import qdrant_manager
+
+from app.utils.logger import get_logger
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+@router.get("/health/live")
+async def live():
+    """Liveness: the process is up and serving requests."""
+    return JSONResponse(content={"status": "alive"})
+
+
+@router.get("/health/ready")
+async def ready():
+    """
+    Readiness: the models of this role are loaded (or, in server inference
+    mode, the inference server answers) and Qdrant is connected.
+    """
+    content = {
+        "role": settings.APP_ROLE,
+        "inference_mode": settings.INFERENCE_MODE,
+        "qdrant_connected": qdrant_manager.is_connected,
+        "models": model_registry.status(),
+    }
+    is_ready = model_registry.ready() and qdrant_manager.is_connected
+
+    if settings.INFERENCE_MODE == "server":
+        from app.services.inference_server import inference_client
+        content["inference_server"] = await asyncio.to_thread(inference_client.ping)
+        is_ready = is_ready and content["inference_server"]
+
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else "starting", **content},
+    )
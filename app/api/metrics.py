@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.embeddings import query_batcher
+from app.services.embedding_cache import embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.artifact_store import artifact_store
+
+from app.utils.logger import get_logger
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    """Return in-process performance counters."""
+    return JSONResponse(content={
+        "query_embedding_batcher": query_batcher.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "artifact_store": artifact_store.stats(),
+    })
@@ -2,11 +2,11 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi import Body
 from fastapi import Request
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
 
-from langgraph.checkpoint.memory import MemorySaver
-
-from app.agents.document_parser.graph import document_parser_graph
+from app.core.settings import settings
+from app.services.job_queue import job_queue
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
@@ -18,75 +18,98 @@ router = APIRouter()
 async def upload_files(
     request: Request,
     files: List[UploadFile] = File(...),
+    wait: bool = False,
+    replace: bool = False,
 ):
     """
-    Upload files and process them through the pipeline:
+    Upload files and queue them for the ingestion pipeline:
     1. File upload and metadata creation
     2. Content extraction
     3. Text chunking
     4. Embedding generation
-    """
 
-    logger.info(f"Received upload request with {len(files)} files")
+    Returns one job per file right away; progress is reported by /jobs/{job_id}.
+    With wait=true the files are still processed concurrently by the workers,
+    and the response carries each file's final result.
 
-    # static for now
-    thread_id = "upload"
-
-    config = {"configurable": {"thread_id": str(thread_id)}}
+    A file whose name matches an earlier upload is stored as a separate
+    document (reusing the embeddings of unchanged chunks); with replace=true
+    it replaces the latest document of that name instead.
+    """
 
-    memory = MemorySaver()
+    logger.info(f"Received upload request with {len(files)} files")
 
     results = []
     for file in files:
         try:
-
-            try:
-                from app.utils.file_handler import save_file  # Import here to avoid circular dependency
-                result = await save_file(file)
-                file_path = result.get("file_path")
-                original_filename = result.get("original_filename")
-            except Exception as e:
-                logger.error(f"Failed to read file {file.filename}: {str(e)}")
-                results.append({
-                    "filename": file.filename,
-                    "status": "failed",
-                    "error": f"File read error: {str(e)}"
-                })
-                continue
-
-            initial_state = {
-                "file_path": file_path,
-                "original_filename": original_filename,
-            }
-
-            graph = await document_parser_graph(checkpointer=memory)
-
-            response = await graph.ainvoke(
-                initial_state,
-                config=config,
+            from app.utils.file_handler import save_file  # Import here to avoid circular dependency
+            result = await save_file(file)
+
+            job = await job_queue.enqueue(
+                file_path=result.get("file_path"),
+                original_filename=result.get("original_filename"),
+                content_hash=result.get("content_hash"),
+                replace=replace,
             )
-
             results.append({
-                    "filename": response.get("original_filename"),
-                    "status": "success",
-                })
+                "filename": file.filename,
+                "job_id": job["id"],
+                "status": job["status"],
+            })
 
         except Exception as e:
-            logger.error(f"Failed to initialize state for file {file.filename}: {str(e)}")
+            logger.error(f"Failed to read file {file.filename}: {str(e)}")
             results.append({
                 "filename": file.filename,
                 "status": "failed",
-                "error": f"State initialization error: {str(e)}"
+                "error": f"File read error: {str(e)}"
             })
             continue
 
-    
+    if not wait:
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Upload accepted",
+                "results": results,
+            }
+        )
+
+    # Wait for all queued files together; the worker pool runs them concurrently
+    queued = [r for r in results if r.get("job_id")]
+    jobs = await asyncio.gather(*(
+        job_queue.wait(r["job_id"], timeout=settings.UPLOAD_WAIT_TIMEOUT) for r in queued
+    ))
+    for r, job in zip(queued, jobs):
+        r.update({
+            "status": job["status"],
+            "stages": job["stages"],
+            "result": job["result"],
+            "error": job["error"],
+        })
+
     return JSONResponse(
         status_code=200,
         content={
             "message": "Upload processed",
-            # "results": results,
-            # "successful": [r for r in results if r["status"] == "success"],
-            # "failed": [r for r in results if r["status"] == "failed"],
+            "results": results,
+            "successful": [r for r in results if r["status"] in ("success", "duplicate")],
+            "failed": [r for r in results if r["status"] == "failed"],
         }
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/jobs", response_model=Dict)
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent ingestion jobs, optionally filtered by status."""
+    jobs = await job_queue.list(status=status, limit=min(limit, 500))
+    return JSONResponse(content={"jobs": jobs})
+
+
+@router.get("/jobs/{job_id}", response_model=Dict)
+async def get_job(job_id: str):
+    """Return the status and per-stage timings of an ingestion job."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return JSONResponse(content=job)
@@ -19,16 +19,108 @@ class Settings(BaseSettings):
     COLLECTION_NAME: str = "documents_test"
     VECTOR_SIZE: int = 1024
     DISTANCE: Distance = Distance.COSINE
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    QDRANT_UPSERT_PARALLEL: int = 4
+
+    # Qdrant storage and index settings; existing collections are rebuilt
+    # with `python -m app.scripts.migrate_collection`
+    QDRANT_QUANTIZATION: str = "none"  # "none", "scalar" (int8) or "binary"
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_RESCORE: bool = True
+    QDRANT_OVERSAMPLING: float = 2.0
+    QDRANT_ON_DISK_VECTORS: bool = False
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_HNSW_EF: int = 0  # per-query search breadth, 0 uses the server default
+
+    # Retrieval settings; hybrid search stores "dense" and BM25 "sparse" named
+    # vectors and fuses both rankings (legacy dense-only collections fall back)
+    HYBRID_SEARCH: bool = True
+    SEARCH_LIMIT: int = 8
+    SEARCH_PREFETCH_LIMIT: int = 40
+    BM25_AVG_DOC_LENGTH: float = 256.0
+
+    # Retrieval post-processing: optional CPU cross-encoder reranking of
+    # RERANK_CANDIDATES hits, then adjacent-chunk merging and a context budget
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    RERANKER_BATCH_SIZE: int = 16
+    RERANK_CANDIDATES: int = 24
+    CONTEXT_TOKEN_BUDGET: int = 2000
 
     # LLM Models
     QWEN_LLM: str = "qwen/qwen3-32b"
     OPENAI_GPT_120: str = "openai/gpt-oss-120b"
     OPENAI_GPT_20: str = "openai/gpt-oss-20b"
-    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
-    
+    EMBEDDING_MODEL: str = "intfloat/multilingual-e5-large"
+
+    # Embedding settings
+    # Inference backend: "torch", "onnx" or "onnx-int8" (dynamically quantized);
+    # ONNX models are exported with `python -m app.scripts.export_embedding_model`
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_PATH: Path = Path("models/multilingual-e5-large-onnx")
+    EMBEDDING_ONNX_QUANTIZATION: str = "avx512_vnni"  # "arm64", "avx2", "avx512" or "avx512_vnni"
+    EMBEDDING_BATCH_SIZE: int = 32
+    # dtype passage embeddings are kept in until they are written to Qdrant;
+    # "float16" halves ingestion memory (Qdrant stores float32 either way)
+    EMBEDDING_DTYPE: str = "float32"
+    QUERY_BATCH_MAX_WAIT_MS: float = 5.0
+    QUERY_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 20000
+    EMBEDDING_CACHE_DISK_ITEMS: int = 1000000
+    EMBEDDING_CACHE_PATH: Path = Path("data/embedding_cache.sqlite3")
+
+    # Chunking settings, in embedding model tokens (e5 truncates at 512
+    # including the "passage: " prefix and special tokens)
+    CHUNK_MAX_TOKENS: int = 480
+    CHUNK_OVERLAP_TOKENS: int = 64
+
     # Models settings 
     TEMPERATURE: float = 0.7
 
+    # Shared HTTP connection pool for LLM clients
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 60.0
+
+    # Graph checkpointer settings ("memory" or "sqlite")
+    CHECKPOINTER_BACKEND: str = "memory"
+    CHECKPOINT_MAX_THREADS: int = 1000
+    CHECKPOINT_TTL_SECONDS: float = 3600.0
+    CHECKPOINT_DB_PATH: Path = Path("data/checkpoints.sqlite3")
+    CHAT_HISTORY_MAX_MESSAGES: int = 20
+    # Large intermediate results (embeddings) are kept out of checkpoints
+    # and dropped after this long if their run never releases them
+    ARTIFACT_TTL_SECONDS: float = 3600.0
+
+    # Chat retrieval mode: "react" lets the agent call the search tool,
+    # "direct" always retrieves first and answers with a single LLM call
+    RAG_MODE: str = "react"
+
+    # Semantic answer cache for first-turn chat questions
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ITEMS: int = 2000
+    ANSWER_CACHE_TTL_SECONDS: float = 86400.0
+
+    # Process role: "all", "chat" (no ingestion workers or OCR models) or
+    # "ingest" (ingestion workers only); models of the role warm up in the
+    # background at startup, or load on first use with MODEL_WARMUP=False
+    APP_ROLE: str = "all"
+    MODEL_WARMUP: bool = True
+
+    # Inference mode: "local" loads the embedding and EasyOCR models in every
+    # process, "server" sends embed/ocr requests to one shared model process
+    # (`python -m app.services.inference_server`) over a Unix socket
+    INFERENCE_MODE: str = "local"
+    INFERENCE_SOCKET_PATH: Path = Path("data/inference.sock")
+    INFERENCE_BATCH_WAIT_MS: float = 5.0
+    INFERENCE_MAX_BATCH: int = 64
+    INFERENCE_TIMEOUT: float = 300.0
+
     # logging settings
     DEBUG: bool = False
     LOG_LEVEL: str = "DEBUG"
@@ -43,8 +135,42 @@ class Settings(BaseSettings):
     # Easyocr Languages list
     EASYOCR_LANGUAGES: list = ['en']
 
+    # Tesseract OCR settings
+    TESSERACT_CMD: str = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    OCR_WORKERS: int = 0  # 0 = one worker per CPU core
+    OCR_DPI: int = 300
+    OCR_LANG: str = "ara"
+
+    # PDF text layer checks (pages failing them are OCR-ed)
+    PDF_MIN_PAGE_CHARS: int = 40
+    PDF_MIN_SCRIPT_RATIO: float = 0.6
+    PDF_MAX_GARBAGE_RATIO: float = 0.05
+
+    # Spreadsheets are read row by row and split into blocks of this many rows
+    EXCEL_ROWS_PER_BLOCK: int = 200
+
     # Document settings
     DATA_DIR: Path = Path("data/docs")
+    DOCUMENT_INDEX_PATH: Path = Path("data/document_index.sqlite3")
+
+    # Ingestion settings
+    INGESTION_STREAMING: bool = False
+    STREAM_QUEUE_SIZE: int = 8
+
+    # Ingestion job queue settings
+    JOB_QUEUE_PATH: Path = Path("data/jobs.sqlite3")
+    INGEST_WORKERS: int = 4
+    JOB_POLL_INTERVAL: float = 2.0
+    # A running job is leased by its process and renewed while it runs; jobs
+    # whose lease expired (the process died) are picked up again
+    JOB_LEASE_SECONDS: float = 120.0
+    UPLOAD_WAIT_TIMEOUT: float = 600.0
+
+    # Per-stage concurrency limits across ingestion jobs
+    EXTRACTION_CONCURRENCY: int = 2
+    EMBEDDING_CONCURRENCY: int = 1
+    LLM_CONCURRENCY: int = 4
+    QDRANT_WRITE_CONCURRENCY: int = 8
 
     # category list
     CATEGORY_LIST: list = [
@@ -5,11 +5,21 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from contextlib import asynccontextmanager
+
+from app.agents.document_parser.graph import document_parser_graph
+from app.agents.rag_chat.graph import rag_chat_graph
+from app.services.checkpointer import open_checkpointer
 from app.services.qdrant_client import qdrant_manager
+from app.services.job_queue import job_queue
+from app.services.ocr import shutdown_ocr_pool
+from app.services.model_registry import model_registry, APP_ROLES
 from app.core.settings import settings
+from app.utils.helpers import aclose_http_clients
 from app.api import (
     upload_router,
-    chat_router
+    chat_router,
+    metrics_router,
+    health_router
 )
 
 from app.utils.logger import get_logger
@@ -21,16 +31,46 @@ async def lifespan(app: FastAPI):
     """Manage application lifespan - startup and shutdown"""
     
     # Startup
+    if settings.APP_ROLE not in APP_ROLES:
+        raise ValueError(f"Unknown APP_ROLE: {settings.APP_ROLE} (expected one of {APP_ROLES})")
+
     try:
+        # Load this role's models in the background; /health/ready reports when they are in
+        if settings.MODEL_WARMUP:
+            model_registry.start_warmup()
+
         # Initialize Qdrant connection
         await qdrant_manager.connect()
 
-        logger.info("Application started successfully")
-        yield
+        async with open_checkpointer() as checkpointer:
+            # Compile graphs once and reuse them for every request
+            app.state.rag_chat_graph = await rag_chat_graph(checkpointer=checkpointer)
+            # Ingestion runs are tracked by the job queue and never resumed, so they keep no checkpoints
+            app.state.document_parser_graph = await document_parser_graph(checkpointer=None)
+
+            # Start background ingestion workers; chat-only processes just enqueue
+            # uploads for the ingest processes sharing the job queue
+            if settings.APP_ROLE != "chat":
+                await job_queue.start(app.state.document_parser_graph)
+
+            logger.info(f"Application started successfully (role: {settings.APP_ROLE})")
+            try:
+                yield
+            finally:
+                # Stop ingestion workers
+                await job_queue.stop()
         
     finally:     
+        await model_registry.stop_warmup()
+
         # Close qdrant database pool
         await qdrant_manager.close()
+
+        # Close pooled LLM HTTP connections
+        await aclose_http_clients()
+
+        # Stop OCR worker processes
+        shutdown_ocr_pool()
         
         print("Application shutdown complete")
 
@@ -50,6 +90,8 @@ app.add_middleware(
 
 app.include_router(upload_router, prefix="/api/files", tags=["files"])
 app.include_router(chat_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api", tags=["metrics"])
+app.include_router(health_router, tags=["health"])
 
 # upload files html page
 @app.get("/upload", response_class=HTMLResponse)
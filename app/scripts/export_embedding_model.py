@@ -0,0 +1,103 @@
+"""
+Export the embedding model to ONNX, add a dynamically quantized int8 variant
+and verify both against the PyTorch reference model:
+
+    python -m app.scripts.export_embedding_model [--output DIR] [--quantization avx512_vnni]
+                                                 [--samples FILE] [--min-cosine 0.99]
+
+The exported directory is what EMBEDDING_ONNX_PATH points to. Verification
+embeds a sample set (built-in Arabic/English queries and passages, or one text
+per line from --samples) with every backend, reports the cosine agreement
+with the reference vectors and the encode time, and exits non-zero when an
+exported backend falls below --min-cosine.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+from app.core.settings import settings
+from app.services.embeddings import QUERY_PREFIX, PASSAGE_PREFIX, quantized_file_name
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SAMPLE_TEXTS = [
+    QUERY_PREFIX + "what is the annual leave policy?",
+    QUERY_PREFIX + "ما هي سياسة الإجازة السنوية؟",
+    QUERY_PREFIX + "travel allowance for engineers",
+    QUERY_PREFIX + "قرار رقم 12 لسنة 2024",
+    PASSAGE_PREFIX + "Employees are entitled to 30 days of paid annual leave after one year of service.",
+    PASSAGE_PREFIX + "يستحق الموظف إجازة سنوية مدفوعة الأجر مدتها ثلاثون يوماً بعد إتمام سنة من الخدمة.",
+    PASSAGE_PREFIX + "Article 77: travel expenses are reimbursed against original receipts within 30 days.",
+    PASSAGE_PREFIX + "المادة 77: تصرف بدلات السفر وفقاً للجدول المرفق بهذا القرار.",
+    PASSAGE_PREFIX + "The procurement committee reviews all purchase orders above 50,000 SAR.",
+    PASSAGE_PREFIX + "تلتزم الإدارة بمراجعة العقود قبل توقيعها والتأكد من مطابقتها للأنظمة.",
+]
+
+
+def load_samples(path: Path) -> List[str]:
+    """One text per line; lines without an E5 prefix are treated as passages"""
+    texts = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line:
+            texts.append(line if line.startswith((QUERY_PREFIX, PASSAGE_PREFIX)) else PASSAGE_PREFIX + line)
+    return texts
+
+
+def encode(model: SentenceTransformer, texts: List[str]):
+    """Normalized embeddings and the time it took to encode them"""
+    started = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE, normalize_embeddings=True)
+    return np.asarray(embeddings, dtype=np.float32), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and verify ONNX embedding backends")
+    parser.add_argument("--output", type=Path, default=settings.EMBEDDING_ONNX_PATH)
+    parser.add_argument("--quantization", default=settings.EMBEDDING_ONNX_QUANTIZATION,
+                        choices=["arm64", "avx2", "avx512", "avx512_vnni"])
+    parser.add_argument("--samples", type=Path, help="text file with one sample per line")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--verify-only", action="store_true", help="skip the export, verify an existing one")
+    args = parser.parse_args()
+
+    if not args.verify_only:
+        logger.info(f"Exporting {settings.EMBEDDING_MODEL} to ONNX in {args.output}")
+        onnx_model = SentenceTransformer(settings.EMBEDDING_MODEL, backend="onnx")
+        onnx_model.save_pretrained(str(args.output))
+        export_dynamic_quantized_onnx_model(onnx_model, args.quantization, str(args.output))
+        logger.info(f"Exported int8 model ({args.quantization}) to {args.output / quantized_file_name(args.quantization)}")
+
+    texts = load_samples(args.samples) if args.samples else SAMPLE_TEXTS
+    reference, reference_time = encode(SentenceTransformer(settings.EMBEDDING_MODEL), texts)
+    print(f"{'backend':<10} {'mean cos':>9} {'min cos':>9} {'seconds':>8} {'speedup':>8}")
+    print(f"{'torch':<10} {1.0:>9.4f} {1.0:>9.4f} {reference_time:>8.2f} {1.0:>7.2f}x")
+
+    candidates = {
+        "onnx": SentenceTransformer(str(args.output), backend="onnx"),
+        "onnx-int8": SentenceTransformer(
+            str(args.output), backend="onnx",
+            model_kwargs={"file_name": quantized_file_name(args.quantization)},
+        ),
+    }
+
+    failed = False
+    for backend, model in candidates.items():
+        embeddings, elapsed = encode(model, texts)
+        cosine = np.sum(embeddings * reference, axis=1)
+        print(f"{backend:<10} {cosine.mean():>9.4f} {cosine.min():>9.4f} {elapsed:>8.2f} {reference_time / elapsed:>7.2f}x")
+        if cosine.min() < args.min_cosine:
+            failed = True
+            logger.error(f"{backend} agreement {cosine.min():.4f} is below {args.min_cosine}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Rebuild the document collection with the current Qdrant settings
+(quantization, on-disk storage, HNSW parameters, hybrid dense + sparse
+vectors; legacy dense-only points get their sparse vectors on the way).
+
+Points are copied into a new versioned collection and COLLECTION_NAME is then
+switched to it as an alias, so the app keeps using the same name:
+
+    python -m app.scripts.migrate_collection [--target NAME] [--batch-size N] [--keep-old]
+
+The first migration of a plain collection has to drop it before the alias can
+take its name, so writes should be paused while it runs. Later migrations
+swap the alias atomically.
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from qdrant_client.http.models import (
+    PointStruct, CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+)
+
+from app.core.settings import settings
+from app.services.qdrant_client import qdrant_manager, DENSE_VECTOR, SPARSE_VECTOR
+from app.services.sparse import sparse_document_vector
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def resolve_alias(alias_name: str) -> Optional[str]:
+    """Return the collection an alias points to, None if it is not an alias"""
+    aliases = await qdrant_manager._client.get_aliases()
+    for alias in aliases.aliases:
+        if alias.alias_name == alias_name:
+            return alias.collection_name
+    return None
+
+
+def convert_point(record, hybrid: bool) -> PointStruct:
+    """
+    Turn a scrolled record into a point for the new collection; dense-only
+    records get their BM25 sparse vector computed from the chunk text
+    """
+    dense = record.vector.get(DENSE_VECTOR) if isinstance(record.vector, dict) else record.vector
+    if not hybrid:
+        return PointStruct(id=record.id, vector=dense, payload=record.payload)
+
+    sparse = record.vector.get(SPARSE_VECTOR) if isinstance(record.vector, dict) else None
+    if sparse is None:
+        sparse = sparse_document_vector((record.payload or {}).get("chunk_text") or "")
+    return PointStruct(
+        id=record.id,
+        vector={DENSE_VECTOR: dense, SPARSE_VECTOR: sparse},
+        payload=record.payload,
+    )
+
+
+async def copy_points(source: str, target: str, batch_size: int) -> int:
+    """Copy every point with its vector and payload, returning the number copied"""
+    hybrid = await qdrant_manager.is_hybrid(target)
+    copied = 0
+    offset = None
+    while True:
+        records, offset = await qdrant_manager._client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            await qdrant_manager.upsert_points(
+                [convert_point(record, hybrid) for record in records],
+                batch_size=batch_size,
+                collection_name=target,
+            )
+            copied += len(records)
+            logger.info(f"Copied {copied} points")
+        if offset is None:
+            return copied
+
+
+async def migrate(target: Optional[str], batch_size: int, keep_old: bool):
+    name = settings.COLLECTION_NAME
+    await qdrant_manager.connect()
+    client = qdrant_manager._client
+
+    source = await resolve_alias(name) or name
+    target = target or f"{name}_{int(time.time())}"
+    if await qdrant_manager.collection_exists(target):
+        raise SystemExit(f"Target collection '{target}' already exists")
+
+    await qdrant_manager.create_collection(target, settings.VECTOR_SIZE, settings.DISTANCE)
+    await qdrant_manager.ensure_payload_indexes(target)
+
+    started = time.perf_counter()
+    copied = await copy_points(source, target, batch_size)
+
+    source_count = (await client.count(collection_name=source, exact=True)).count
+    target_count = (await client.count(collection_name=target, exact=True)).count
+    if source_count != target_count:
+        raise SystemExit(
+            f"Point count mismatch after copy: {source} has {source_count}, {target} has {target_count}; "
+            f"'{name}' still points to '{source}'"
+        )
+    logger.info(f"Copied {copied} points from '{source}' to '{target}' in {time.perf_counter() - started:.1f}s")
+
+    if source == name:
+        # A plain collection holds the name, it has to go before the alias can exist
+        await client.delete_collection(name)
+        await client.update_collection_aliases(change_aliases_operations=[
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=name)),
+        ])
+    else:
+        await client.update_collection_aliases(change_aliases_operations=[
+            DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=name)),
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=name)),
+        ])
+        if not keep_old:
+            await client.delete_collection(source)
+    logger.info(f"'{name}' now points to '{target}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the Qdrant collection with the current settings")
+    parser.add_argument("--target", help="name of the new collection (default: COLLECTION_NAME_<timestamp>)")
+    parser.add_argument("--batch-size", type=int, default=settings.QDRANT_UPSERT_BATCH_SIZE)
+    parser.add_argument("--keep-old", action="store_true", help="keep the previous collection after an alias swap")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.target, args.batch_size, args.keep_old))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from app.core.settings import settings
+from app.services.document_index import document_index
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    references: List[dict]
+    # Files the answer was grounded on; re-ingesting or deleting one invalidates it
+    sources: frozenset
+    # Corpus generation the answer was produced in
+    generation: int
+    # Search filters the answer was produced under
+    scope: str = ""
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    In-process semantic cache of chat answers. Query embeddings are kept in a
+    NumPy matrix and a lookup is a single matrix-vector product; a hit needs a
+    cosine similarity above the threshold. Entries expire after a TTL and the
+    least recently used ones are evicted once the cache is full.
+
+    Ingestion bumps a corpus generation kept in the document index, so every
+    worker process sees it. Answers grounded on documents are stale once one
+    of those documents is ingested in a later generation. Answers without
+    references are only valid for the generation they were produced in,
+    since any new document may now be able to answer them.
+    """
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        threshold: Optional[float] = None,
+        dim: Optional[int] = None,
+    ):
+        self.max_items = max_items or settings.ANSWER_CACHE_MAX_ITEMS
+        self.ttl_seconds = ttl_seconds or settings.ANSWER_CACHE_TTL_SECONDS
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.dim = dim or settings.VECTOR_SIZE
+        # Last corpus generation seen, for stats
+        self.generation = 0
+
+        self._vectors = np.zeros((self.max_items, self.dim), dtype=np.float32)
+        self._entries: List[Optional[CachedAnswer]] = [None] * self.max_items
+        # slot -> last use, oldest first
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free = list(range(self.max_items - 1, -1, -1))
+        self._lock = threading.Lock()
+
+        # hit/miss counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _release(self, slot: int):
+        """Free a slot (caller holds the lock)"""
+        self._entries[slot] = None
+        self._vectors[slot] = 0.0
+        self._lru.pop(slot, None)
+        self._free.append(slot)
+
+    async def current_generation(self) -> int:
+        """The corpus generation to look up and store answers under"""
+        self.generation = await document_index.get_generation()
+        return self.generation
+
+    async def _is_stale(self, entry: CachedAnswer, generation: int, now: float) -> bool:
+        if now - entry.created_at > self.ttl_seconds:
+            return True
+        if entry.generation == generation:
+            return False
+        if not entry.sources:
+            return True
+        return await document_index.get_generation(entry.sources) > entry.generation
+
+    async def lookup(self, embedding, generation: int, scope: str = "") -> Optional[CachedAnswer]:
+        """Return the closest cached answer in the scope above the similarity threshold"""
+        query = np.asarray(embedding, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            candidates = []
+            if self._lru:
+                # Empty slots are zero vectors and never pass the threshold
+                scores = self._vectors @ query
+                for slot in map(int, np.argsort(scores)[::-1]):
+                    if scores[slot] < self.threshold:
+                        break
+                    entry = self._entries[slot]
+                    if entry is not None and entry.scope == scope:
+                        candidates.append((slot, entry))
+
+        # Staleness may need the document index, checked outside the lock
+        for slot, entry in candidates:
+            stale = await self._is_stale(entry, generation, now)
+            with self._lock:
+                if self._entries[slot] is not entry:
+                    continue
+                if stale:
+                    self._release(slot)
+                    continue
+                self._lru.move_to_end(slot)
+                self.hits += 1
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(
+        self,
+        embedding,
+        query: str,
+        answer: str,
+        references: List[dict],
+        generation: int,
+        scope: str = "",
+    ):
+        """Cache an answer for the query embedding, produced in the given corpus generation"""
+        sources = frozenset(ref.get("file_name") for ref in references if ref.get("file_name"))
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            references=references,
+            sources=sources,
+            generation=generation,
+            scope=scope,
+        )
+        with self._lock:
+            if not self._free:
+                oldest, _ = self._lru.popitem(last=False)
+                self._release(oldest)
+            slot = self._free.pop()
+            self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+            self._entries[slot] = entry
+            self._lru[slot] = None
+
+    async def invalidate_documents(self, filenames: Iterable[str]):
+        """
+        Bump the shared corpus generation for these files. Answers grounded on
+        them are also dropped from this process right away; other processes
+        find them stale on lookup.
+        """
+        filenames = set(filenames)
+        self.generation = await document_index.bump_generation(filenames)
+        with self._lock:
+            stale = [
+                slot for slot in self._lru
+                if self._entries[slot].sources & filenames
+            ]
+            for slot in stale:
+                self._release(slot)
+            self.invalidations += len(stale)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers for {sorted(filenames)}")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "items": len(self._lru),
+            "capacity": self.max_items,
+            "generation": self.generation,
+        }
+
+
+# Singleton cache
+answer_cache = SemanticAnswerCache()
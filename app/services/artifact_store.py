@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArtifactStore:
+    """
+    In-process store for large intermediate results of a graph run, such as
+    embedding matrices. Graph state only holds the reference returned by
+    `put`, so the checkpointer never copies or serializes the data itself.
+    Artifacts are released when their run finishes; a TTL cleans up after
+    runs that never do.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds or settings.ARTIFACT_TTL_SECONDS
+        self._items: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, run_id: str, name: str, value: Any) -> str:
+        """Store an artifact of a run and return its reference"""
+        ref = f"{run_id}/{name}"
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (created, _) in self._items.items() if now - created > self.ttl_seconds]
+            for key in expired:
+                del self._items[key]
+            self._items[ref] = (now, value)
+        if expired:
+            logger.warning(f"Dropped {len(expired)} expired artifacts")
+        return ref
+
+    def get(self, ref: Optional[str]) -> Any:
+        """The artifact behind a reference, or None when it is gone"""
+        with self._lock:
+            item = self._items.get(ref) if ref else None
+        return item[1] if item else None
+
+    def pop(self, ref: Optional[str]) -> Any:
+        """Take an artifact out of the store once its consumer has it"""
+        with self._lock:
+            item = self._items.pop(ref, None) if ref else None
+        return item[1] if item else None
+
+    def release(self, run_id: str):
+        """Drop every artifact of a run"""
+        prefix = f"{run_id}/"
+        with self._lock:
+            for key in [key for key in self._items if key.startswith(prefix)]:
+                del self._items[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [value for _, value in self._items.values()]
+        return {
+            "items": len(values),
+            "bytes": sum(getattr(value, "nbytes", 0) for value in values),
+        }
+
+
+# Singleton store
+artifact_store = ArtifactStore()
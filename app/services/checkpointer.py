@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """In-memory checkpointer that evicts idle threads by TTL and least recent use"""
+
+    def __init__(self, max_threads: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        super().__init__()
+        self.max_threads = max_threads or settings.CHECKPOINT_MAX_THREADS
+        self.ttl_seconds = ttl_seconds or settings.CHECKPOINT_TTL_SECONDS
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+
+    def _touch(self, config):
+        """Mark a thread as used and evict expired or excess threads"""
+        thread_id = config.get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return
+
+        now = time.monotonic()
+        evicted = []
+        with self._lru_lock:
+            self._last_used[str(thread_id)] = now
+            self._last_used.move_to_end(str(thread_id))
+
+            for oldest, last_used in list(self._last_used.items()):
+                if now - last_used <= self.ttl_seconds and len(self._last_used) <= self.max_threads:
+                    break
+                del self._last_used[oldest]
+                evicted.append(oldest)
+
+        for oldest in evicted:
+            self.delete_thread(oldest)
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} checkpoint threads")
+
+    def get_tuple(self, config):
+        if self.storage.get(str(config.get("configurable", {}).get("thread_id"))):
+            self._touch(config)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self._touch(config)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+@asynccontextmanager
+async def open_checkpointer(backend: Optional[str] = None) -> AsyncIterator[BaseCheckpointSaver]:
+    """Open the configured checkpointer backend ('memory' or 'sqlite') for the app lifetime"""
+    backend = backend or settings.CHECKPOINTER_BACKEND
+
+    if backend == "memory":
+        yield BoundedMemorySaver()
+
+    elif backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "The sqlite checkpointer needs the 'langgraph-checkpoint-sqlite' package"
+            ) from e
+
+        settings.CHECKPOINT_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        async with AsyncSqliteSaver.from_conn_string(str(settings.CHECKPOINT_DB_PATH)) as saver:
+            logger.info(f"Using sqlite checkpointer at {settings.CHECKPOINT_DB_PATH}")
+            yield saver
+
+    else:
+        raise ValueError(f"Unknown checkpointer backend: {backend}")
@@ -1,16 +1,342 @@
-import re
 import asyncio
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-
-async def chunk(text: str):
-    # Normalize Arabic punctuation by inserting line breaks
-    text = re.sub(r"([،؛؟])", r"\1\n", text)
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=700,           # Slightly smaller for Arabic (tokens compress differently)
-        chunk_overlap=150,
-        separators=["\n\n", "\n", " ", "،", "؛", "؟", ""],
-        length_function=len
-    )
-    chunks = await asyncio.to_thread(text_splitter.split_text, text)
-    return [c.strip() for c in chunks if c.strip()]
\ No newline at end of file
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.settings import settings
+from app.services.embeddings import count_tokens
+
+# Titled section headings in Arabic and English, and markdown headings
+HEADING_PATTERN = re.compile(
+    r"^(#{1,6}\s+\S"
+    r"|(?:chapter|section|article|part|annex|appendix)\s+[\w\u0660-\u0669]+"
+    r"|(?:الفصل|المادة|الباب|القسم|البند|الملحق|مادة)\s+\S+)",
+    re.IGNORECASE,
+)
+# Numbered headings ("3.2 Leave"), only when short so list items stay prose
+NUMBERED_HEADING_PATTERN = re.compile(r"^[\d\u0660-\u0669]+(?:\.[\d\u0660-\u0669]+)*[.)-]?\s+\S")
+# Sentence ends: Latin and Arabic full stops, question marks, ellipsis, optionally
+# followed by closing quotes/brackets. Arabic commas and semicolons are not ends.
+SENTENCE_END = re.compile(r"[.!?؟۔…]+[\"'»”)\]]*(?=\s|$)")
+# Clause separators used to split over-long sentences
+CLAUSE_SEP = re.compile(r"[،؛;,:]\s+")
+# Table rows: tab or pipe separated cells (spreadsheet rows are serialized as
+# "Column: value | Column: value"), or columns aligned with runs of spaces
+TABLE_CELL_SEP = re.compile(r"\t|\s\|\s")
+# Gap between space-aligned columns, as in PDF text extracted with its layout
+COLUMN_GAP = re.compile(r" {3,}")
+# Consecutive lines with aligned column gaps needed to read them as a table;
+# a single line with wide spaces is just oddly spaced prose
+MIN_ALIGNED_ROWS = 3
+# List markers ("1.", "b)") that look like sentence ends but start the next sentence
+LIST_MARKER = re.compile(r"^[\w\u0660-\u0669]{1,3}[.)]$")
+TERMINAL_PUNCTUATION = (".", ":", "،", "؛", ";", ",", "?", "؟", "!")
+
+
+@dataclass
+class Unit:
+    """A piece of text that is never split across chunks"""
+    start: int  # global character offsets in the document
+    end: int
+    page: Optional[int]
+    kind: str  # "heading", "table", "row" or "sentence"
+    tokens: int = 0
+
+
+@dataclass
+class _Block:
+    start: int
+    text: str
+    page: Optional[int]
+
+
+def _is_table_line(line: str) -> bool:
+    stripped = line.strip()
+    return " | " in stripped or stripped.count("|") >= 2 or len(TABLE_CELL_SEP.split(stripped)) >= 3
+
+
+def _column_gaps(line: str) -> List[Tuple[int, int]]:
+    """Spans of the wide space runs between columns, leaving out indentation"""
+    return [match.span() for match in COLUMN_GAP.finditer(line.rstrip()) if match.start() > 0]
+
+
+def _aligned_rows(lines: List[Tuple[int, int, str]]) -> Set[int]:
+    """
+    Indices of lines in runs of at least MIN_ALIGNED_ROWS consecutive lines
+    with two or more column gaps, each overlapping a gap of the line above.
+    """
+    aligned: Set[int] = set()
+    run: List[int] = []
+    previous: List[Tuple[int, int]] = []
+    for idx, (_, _, line) in enumerate(lines + [(0, 0, "")]):
+        gaps = _column_gaps(line)
+        matching = sum(1 for s, e in gaps if any(s < pe and ps < e for ps, pe in previous))
+        if len(gaps) >= 2 and (not run or matching >= 2):
+            run.append(idx)
+        else:
+            if len(run) >= MIN_ALIGNED_ROWS:
+                aligned.update(run)
+            run = [idx] if len(gaps) >= 2 else []
+        previous = gaps
+    return aligned
+
+
+def _is_heading(line: str, standalone: bool) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100:
+        return False
+    if HEADING_PATTERN.match(stripped):
+        return True
+    short = len(stripped.split()) <= 8 and not stripped.endswith(TERMINAL_PUNCTUATION)
+    # A short numbered line, or a short line on its own, not ending like a sentence
+    return short and (standalone or bool(NUMBERED_HEADING_PATTERN.match(stripped)))
+
+
+def _sentence_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """Split text[start:end] into sentence spans with surrounding whitespace trimmed"""
+    spans, cursor = [], start
+    for match in SENTENCE_END.finditer(text, start, end):
+        spans.append((cursor, match.end()))
+        cursor = match.end()
+    spans.append((cursor, end))
+
+    trimmed = []
+    for s, e in spans:
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if s < e:
+            trimmed.append((s, e))
+
+    merged = []
+    for s, e in trimmed:
+        if merged and LIST_MARKER.match(text[merged[-1][0]:merged[-1][1]]):
+            merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def split_units(text: str, base: int = 0, page: Optional[int] = None) -> List[Unit]:
+    """
+    Split a block into headings, tables and sentences. Offsets are shifted by
+    `base`, the block's position in the whole document.
+    """
+    lines = []
+    position = 0
+    for line in text.split("\n"):
+        lines.append((position, position + len(line), line))
+        position += len(line) + 1
+
+    aligned = _aligned_rows(lines)
+    units: List[Unit] = []
+    paragraph: Optional[List[int]] = None  # [start, end] of the running paragraph
+    table: Optional[List[int]] = None
+
+    def close_paragraph():
+        nonlocal paragraph
+        if paragraph:
+            for s, e in _sentence_spans(text, *paragraph):
+                units.append(Unit(base + s, base + e, page, "sentence"))
+        paragraph = None
+
+    def close_table():
+        nonlocal table
+        if table:
+            units.append(Unit(base + table[0], base + table[1], page, "table"))
+        table = None
+
+    for idx, (start, end, line) in enumerate(lines):
+        if not line.strip():
+            close_paragraph()
+            close_table()
+            continue
+
+        if idx in aligned or _is_table_line(line):
+            close_paragraph()
+            table = [table[0], end] if table else [start, end]
+            continue
+        close_table()
+
+        previous_blank = idx == 0 or not lines[idx - 1][2].strip()
+        next_blank = idx + 1 == len(lines) or not lines[idx + 1][2].strip()
+        if _is_heading(line, standalone=previous_blank and next_blank) and (paragraph is None or previous_blank):
+            close_paragraph()
+            offset = len(line) - len(line.lstrip())
+            units.append(Unit(base + start + offset, base + start + len(line.rstrip()), page, "heading"))
+            continue
+
+        paragraph = [paragraph[0], end] if paragraph else [start, end]
+
+    close_paragraph()
+    close_table()
+    return units
+
+
+class Chunker:
+    """
+    Token-based, structure-aware chunker. Text arrives block by block (pages
+    or whole documents) and is split into headings, tables and sentences,
+    whose lengths are counted with the embedding model's tokenizer in one
+    batched call per block. Units are packed into chunks of at most
+    max_tokens; a heading always starts a new chunk, tables are kept whole
+    when they fit (and split by rows otherwise), and prose chunks overlap by
+    their trailing sentences.
+
+    Each chunk records its pages and character offsets into the document,
+    i.e. the block texts joined with newlines.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+        self.overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self._blocks: List[_Block] = []
+        self._offset = 0
+        self._units: List[Unit] = []
+        self._tokens = 0
+
+    # ------------------ FEEDING ------------------
+    def feed(self, text: str, page: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Add a block and return the chunks completed by it"""
+        block = _Block(self._offset, text, page)
+        self._blocks.append(block)
+        self._offset += len(text) + 1
+
+        units = self._fit(split_units(text, block.start, page))
+        chunks = []
+        for unit in units:
+            chunks.extend(self._add(unit))
+        return chunks
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Return the last, partially filled chunk"""
+        chunks = [self._flush(overlap=False)] if self._units else []
+        self._blocks = []
+        return chunks
+
+    # ------------------ SIZING ------------------
+    def _text(self, start: int, end: int) -> str:
+        """Document text between global offsets, across block boundaries"""
+        parts = []
+        for block in self._blocks:
+            block_end = block.start + len(block.text)
+            if block_end < start or block.start > end:
+                continue
+            parts.append(block.text[max(start - block.start, 0):min(end, block_end) - block.start])
+        return "\n".join(parts)
+
+    def _fit(self, units: List[Unit]) -> List[Unit]:
+        """Count tokens and split units that cannot fit in one chunk"""
+        for unit, tokens in zip(units, count_tokens([self._text(u.start, u.end) for u in units])):
+            unit.tokens = tokens
+
+        fitted = []
+        for unit in units:
+            if unit.tokens <= self.max_tokens:
+                fitted.append(unit)
+            elif unit.kind == "table":
+                fitted.extend(self._fit(self._table_rows(unit)))
+            else:
+                fitted.extend(self._split_long(unit))
+        return fitted
+
+    def _table_rows(self, unit: Unit) -> List[Unit]:
+        rows, position = [], unit.start
+        for line in self._text(unit.start, unit.end).split("\n"):
+            if line.strip():
+                rows.append(Unit(position, position + len(line), unit.page, "row"))
+            position += len(line) + 1
+        if len(rows) == 1:
+            # A single row longer than a chunk is split like prose
+            rows[0].kind = "sentence"
+        return rows
+
+    def _split_long(self, unit: Unit) -> List[Unit]:
+        """Split an over-long sentence at clause separators, then between words"""
+        text = self._text(unit.start, unit.end)
+        spans, cursor = [], 0
+        for match in CLAUSE_SEP.finditer(text):
+            spans.append((cursor, match.end()))
+            cursor = match.end()
+        spans.append((cursor, len(text)))
+        if len(spans) == 1:
+            spans = [m.span() for m in re.finditer(r"\S+\s*", text)]
+
+        counts = count_tokens([text[s:e] for s, e in spans])
+        pieces, piece_start, piece_tokens = [], spans[0][0], 0
+        for (s, e), tokens in zip(spans, counts):
+            if piece_tokens and piece_tokens + tokens > self.max_tokens:
+                pieces.append((piece_start, s, piece_tokens))
+                piece_start, piece_tokens = s, 0
+            piece_tokens += tokens
+        pieces.append((piece_start, len(text), piece_tokens))
+
+        result = []
+        for s, e, tokens in pieces:
+            piece = Unit(unit.start + s, unit.start + len(text[:e].rstrip()), unit.page, "sentence", tokens)
+            if tokens > self.max_tokens and len(pieces) > 1:
+                result.extend(self._split_long(piece))
+            else:
+                result.append(piece)
+        return result
+
+    # ------------------ PACKING ------------------
+    def _add(self, unit: Unit) -> List[Dict[str, Any]]:
+        chunks = []
+        has_body = any(u.kind != "heading" for u in self._units)
+        if unit.kind == "heading" and has_body:
+            # New section, and the overlap would belong to the previous one
+            chunks.append(self._flush(overlap=False))
+        elif self._units and self._tokens + unit.tokens > self.max_tokens:
+            chunks.append(self._flush(overlap=unit.kind == "sentence"))
+            if self._tokens + unit.tokens > self.max_tokens:
+                self._units, self._tokens = [], 0
+        self._units.append(unit)
+        self._tokens += unit.tokens
+        return chunks
+
+    def _flush(self, overlap: bool) -> Dict[str, Any]:
+        units = self._units
+        pages = [u.page for u in units if u.page is not None]
+        chunk = {
+            "text": self._text(units[0].start, units[-1].end).strip(),
+            "page_start": min(pages) if pages else None,
+            "page_end": max(pages) if pages else None,
+            "char_start": units[0].start,
+            "char_end": units[-1].end,
+            "token_count": self._tokens,
+        }
+
+        # Carry trailing sentences into the next chunk
+        carry, carry_tokens = [], 0
+        if overlap and self.overlap_tokens:
+            for u in reversed(units[1:]):
+                if u.kind != "sentence" or carry_tokens + u.tokens > self.overlap_tokens:
+                    break
+                carry.insert(0, u)
+                carry_tokens += u.tokens
+        self._units, self._tokens = carry, carry_tokens
+
+        # Blocks before the carried units are no longer needed
+        keep_from = carry[0].start if carry else units[-1].end
+        self._blocks = [b for b in self._blocks if b.start + len(b.text) >= keep_from]
+        return chunk
+
+
+def chunk_blocks_sync(blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunk a sequence of {"text", "page"} blocks"""
+    chunker = Chunker()
+    chunks = []
+    for block in blocks:
+        chunks.extend(chunker.feed(block.get("text") or "", block.get("page")))
+    chunks.extend(chunker.finish())
+    return [c for c in chunks if c["text"]]
+
+
+async def chunk_blocks(blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Chunk a document given as {"text", "page"} blocks. Returns chunks with
+    text, page_start/page_end, char_start/char_end and token_count.
+    """
+    return await asyncio.to_thread(chunk_blocks_sync, list(blocks))
@@ -0,0 +1,21 @@
+import asyncio
+
+from app.core.settings import settings
+
+
+class StageLimits:
+    """
+    Per-stage concurrency limits shared by all ingestion jobs, so that
+    CPU-bound and I/O-bound stages of different files overlap without
+    oversubscribing any single resource.
+    """
+
+    def __init__(self):
+        self.extraction = asyncio.Semaphore(settings.EXTRACTION_CONCURRENCY)
+        self.embedding = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+        self.llm = asyncio.Semaphore(settings.LLM_CONCURRENCY)
+        self.qdrant_write = asyncio.Semaphore(settings.QDRANT_WRITE_CONCURRENCY)
+
+
+# Singleton limits
+stage_limits = StageLimits()
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Iterable, List, Dict, Any
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class DocumentIndex:
+    """Persistent SQLite index of ingested documents keyed by content hash"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        content_hash TEXT PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        original_filename TEXT,
+        file_category TEXT,
+        doc_text TEXT,
+        chunk_count INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_documents_filename
+        ON documents (original_filename, created_at);
+    CREATE TABLE IF NOT EXISTS chunks (
+        content_hash TEXT NOT NULL REFERENCES documents (content_hash) ON DELETE CASCADE,
+        chunk_index INTEGER NOT NULL,
+        chunk_hash TEXT NOT NULL,
+        point_id TEXT NOT NULL,
+        chunk_text TEXT,
+        PRIMARY KEY (content_hash, chunk_index)
+    );
+    -- Bumped on every ingestion so answer caches in any process see changes
+    CREATE TABLE IF NOT EXISTS corpus_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        generation INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS file_generations (
+        original_filename TEXT PRIMARY KEY,
+        generation INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or settings.DOCUMENT_INDEX_PATH)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def _run(self, fn, *args):
+        """Run a database call under the connection lock"""
+        with self._lock:
+            return fn(self._connection(), *args)
+
+    # ------------------ READ ------------------
+    async def get_document(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the indexed document with this content hash, if any"""
+        def _get(conn, content_hash):
+            row = conn.execute(
+                "SELECT * FROM documents WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            return dict(row) if row else None
+
+        return await asyncio.to_thread(self._run, _get, content_hash)
+
+    async def get_latest_version(self, original_filename: str) -> Optional[Dict[str, Any]]:
+        """Return the most recently indexed document uploaded under this filename"""
+        def _get(conn, original_filename):
+            row = conn.execute(
+                "SELECT * FROM documents WHERE original_filename = ? ORDER BY created_at DESC LIMIT 1",
+                (original_filename,),
+            ).fetchone()
+            return dict(row) if row else None
+
+        return await asyncio.to_thread(self._run, _get, original_filename)
+
+    async def get_chunks(self, content_hash: str) -> List[Dict[str, Any]]:
+        """Return the chunk hashes and point ids of an indexed document"""
+        def _get(conn, content_hash):
+            rows = conn.execute(
+                "SELECT chunk_index, chunk_hash, point_id FROM chunks WHERE content_hash = ? ORDER BY chunk_index",
+                (content_hash,),
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+        return await asyncio.to_thread(self._run, _get, content_hash)
+
+    async def get_generation(self, filenames: Optional[Iterable[str]] = None) -> int:
+        """
+        Return the corpus generation, or with filenames the latest generation
+        in which one of those files was ingested (0 if none was).
+        """
+        def _get(conn, filenames):
+            if filenames is None:
+                row = conn.execute("SELECT generation FROM corpus_generation WHERE id = 0").fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT MAX(generation) AS generation FROM file_generations "
+                    f"WHERE original_filename IN ({', '.join('?' * len(filenames))})",
+                    filenames,
+                ).fetchone()
+            return (row["generation"] if row else None) or 0
+
+        return await asyncio.to_thread(self._run, _get, None if filenames is None else list(filenames))
+
+    # ------------------ WRITE ------------------
+    async def save_document(
+        self,
+        content_hash: str,
+        file_path: str,
+        original_filename: str,
+        file_category: Optional[str],
+        doc_text: Optional[str],
+        chunks: List[Dict[str, Any]],
+    ):
+        """Record a document and its chunks (chunk_hash, point_id, chunk_text)"""
+        def _save(conn, content_hash):
+            with conn:
+                conn.execute("DELETE FROM documents WHERE content_hash = ?", (content_hash,))
+                conn.execute(
+                    "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (content_hash, str(file_path), original_filename, file_category,
+                     doc_text, len(chunks), time.time()),
+                )
+                conn.executemany(
+                    "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (content_hash, idx, c["chunk_hash"], c["point_id"], c.get("chunk_text"))
+                        for idx, c in enumerate(chunks)
+                    ],
+                )
+
+        await asyncio.to_thread(self._run, _save, content_hash)
+        logger.debug(f"Indexed document {content_hash} with {len(chunks)} chunks")
+
+    async def delete_document(self, content_hash: str):
+        """Remove a document and its chunks from the index"""
+        def _delete(conn, content_hash):
+            with conn:
+                conn.execute("DELETE FROM documents WHERE content_hash = ?", (content_hash,))
+
+        await asyncio.to_thread(self._run, _delete, content_hash)
+
+    async def bump_generation(self, filenames: Iterable[str]) -> int:
+        """Start a new corpus generation in which these files changed and return it"""
+        def _bump(conn, filenames):
+            with conn:
+                conn.execute(
+                    "INSERT INTO corpus_generation VALUES (0, 1) "
+                    "ON CONFLICT (id) DO UPDATE SET generation = generation + 1"
+                )
+                generation = conn.execute("SELECT generation FROM corpus_generation WHERE id = 0").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO file_generations VALUES (?, ?) "
+                    "ON CONFLICT (original_filename) DO UPDATE SET generation = excluded.generation",
+                    [(filename, generation) for filename in filenames],
+                )
+            return generation
+
+        return await asyncio.to_thread(self._run, _bump, [f for f in filenames if f])
+
+
+# Singleton index
+document_index = DocumentIndex()
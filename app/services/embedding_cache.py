@@ -0,0 +1,163 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so layout-only differences share a cache entry"""
+    return " ".join(text.split())
+
+
+def cache_key(formatted_text: str, model_name: Optional[str] = None) -> str:
+    """Key an embedding by model name and the prefixed, normalized text"""
+    model_name = model_name or settings.EMBEDDING_MODEL
+    return hashlib.sha256(f"{model_name}\x00{formatted_text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-process LRU in front of an on-disk
+    SQLite store holding float16 vectors. Both tiers are size-bounded and
+    evict the least recently used entries.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        key TEXT PRIMARY KEY,
+        vector BLOB NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        memory_items: Optional[int] = None,
+        disk_items: Optional[int] = None,
+    ):
+        self.db_path = Path(db_path or settings.EMBEDDING_CACHE_PATH)
+        self.memory_items = memory_items or settings.EMBEDDING_CACHE_MEMORY_ITEMS
+        self.disk_items = disk_items or settings.EMBEDDING_CACHE_DISK_ITEMS
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # hit/miss counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the disk store on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the LRU tier, evicting the oldest entries"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached float32 vectors for the keys that are present"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            pending = [key for key in dict.fromkeys(keys) if key not in found]
+            if pending:
+                conn = self._connection()
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+
+                disk_found = [key for key in pending if key in found]
+                if disk_found:
+                    now = time.time()
+                    with conn:
+                        conn.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(now, key) for key in disk_found],
+                        )
+                self.disk_hits += len(disk_found)
+                self.misses += len(pending) - len(disk_found)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Store vectors in both tiers"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(key, vector.astype(np.float16).tobytes(), now) for key, vector in items.items()],
+                )
+                self._evict_disk(conn)
+
+    def _evict_disk(self, conn: sqlite3.Connection):
+        """Drop least recently used rows once the disk tier is over its bound"""
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.disk_items
+        if excess > 0:
+            # Evict a little extra so we do not evict on every insert
+            excess += self.disk_items // 20
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            logger.debug(f"Evicted {excess} embeddings from disk cache")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "memory_capacity": self.memory_items,
+            "disk_capacity": self.disk_items,
+        }
+
+
+# Singleton cache
+embedding_cache = EmbeddingCache()
@@ -1,7 +1,180 @@
 import asyncio
-from sentence_transformers import SentenceTransformer
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.settings import settings
+from app.services.model_registry import model_registry
+from app.services.embedding_cache import embedding_cache, cache_key, normalize_text
+from app.services.concurrency import stage_limits
+
+from app.utils.logger import get_logger
+logger = get_logger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def quantized_file_name(quantization: Optional[str] = None) -> str:
+    """File name of the int8 ONNX model inside an exported model directory."""
+    return f"onnx/model_qint8_{quantization or settings.EMBEDDING_ONNX_QUANTIZATION}.onnx"
+
+
+def load_model(backend: Optional[str] = None):
+    """
+    Load the embedding model on the configured inference backend.
+    ONNX backends use the exported model directory when it exists; plain
+    "onnx" falls back to exporting from the hub model on the fly.
+    """
+    from sentence_transformers import SentenceTransformer  # Import here, torch is slow to import
+
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "torch":
+        return SentenceTransformer(settings.EMBEDDING_MODEL)
+
+    onnx_path = Path(settings.EMBEDDING_ONNX_PATH)
+    if backend == "onnx":
+        source = str(onnx_path) if onnx_path.exists() else settings.EMBEDDING_MODEL
+        return SentenceTransformer(source, backend="onnx")
+    if backend == "onnx-int8":
+        if not (onnx_path / quantized_file_name()).exists():
+            raise FileNotFoundError(
+                f"No quantized model at {onnx_path / quantized_file_name()}; "
+                "run `python -m app.scripts.export_embedding_model` first"
+            )
+        return SentenceTransformer(
+            str(onnx_path), backend="onnx", model_kwargs={"file_name": quantized_file_name()}
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend} (expected one of {EMBEDDING_BACKENDS})")
+
+
+def model_id(backend: Optional[str] = None) -> str:
+    """Cache identity of the model; backends produce slightly different vectors."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    return settings.EMBEDDING_MODEL if backend == "torch" else f"{settings.EMBEDDING_MODEL}@{backend}"
+
+
+def load_tokenizer():
+    """Tokenizer for token counting; in server mode it is loaded without the model."""
+    if settings.INFERENCE_MODE == "server":
+        from transformers import AutoTokenizer  # Import here, only needed in server mode
+        return AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL)
+    return get_model().tokenizer
+
+
+# In server mode the model lives in the inference server process
+model_registry.register(
+    "embedding", load_model, roles=("chat", "ingest") if settings.INFERENCE_MODE == "local" else ()
+)
+# Chat counts tokens to pack the context, ingestion to size chunks
+model_registry.register("tokenizer", load_tokenizer, roles=("chat", "ingest"))
+
+
+def get_model():
+    """The shared embedding model, loaded on first use."""
+    return model_registry.get("embedding")
+
+
+QUERY_PREFIX = "query: "
+PASSAGE_PREFIX = "passage: "
+
+
+def _encode_batched(texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Encode already-prefixed texts in fixed-size batches.
+    Texts are sorted by length so each batch pads to a similar length,
+    and the rows are put back into input order before returning.
+    """
+    model = get_model()
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    embeddings = np.empty((len(texts), settings.VECTOR_SIZE), dtype=np.float32)
+
+    for start in range(0, len(texts), batch_size):
+        batch_idx = order[start:start + batch_size]
+        embeddings[batch_idx] = model.encode(
+            [texts[i] for i in batch_idx],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+
+    return embeddings
+
+
+def _encode(texts: List[str], batch_size: int) -> np.ndarray:
+    """Encode prefixed texts in this process or on the shared inference server."""
+    if settings.INFERENCE_MODE == "server":
+        from app.services.inference_server import inference_client  # Import here to avoid circular dependency
+        return inference_client.embed(texts, batch_size)
+    return _encode_local(texts, batch_size)
+
+
+def _encode_local(texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Encode prefixed texts, serving repeated texts from the embedding cache.
+    Only unique cache misses reach the model.
+    """
+    texts = [normalize_text(t) for t in texts]
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return _encode_batched(texts, batch_size)
+
+    keys = [cache_key(t, model_id()) for t in texts]
+    vectors = embedding_cache.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+
+    if missing:
+        encoded = _encode_batched(list(missing.values()), batch_size)
+        fresh = {key: row.copy() for key, row in zip(missing, encoded)}
+        embedding_cache.put_many(fresh)
+        vectors.update(fresh)
+
+    return np.stack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+
+async def embed_passages(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    """
+    Asynchronously embed a list of document passages in batches.
+    - Adds the 'passage:' prefix expected by E5 models.
+    - Returns a (len(texts), VECTOR_SIZE) matrix of EMBEDDING_DTYPE in input order.
+    """
+    if not texts:
+        return np.empty((0, settings.VECTOR_SIZE), dtype=settings.EMBEDDING_DTYPE)
+
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    formatted_texts = [PASSAGE_PREFIX + text.strip() for text in texts]
+
+    # Encode in a worker thread to avoid blocking event loop
+    async with stage_limits.embedding:
+        embeddings = await asyncio.to_thread(_encode, formatted_texts, batch_size)
+
+    logger.debug(f"Embedded {len(texts)} passages in batches of {batch_size}")
+    return embeddings.astype(settings.EMBEDDING_DTYPE, copy=False)
+
+
+def merge_vectors(fresh: np.ndarray, copied: List[Optional[List[float]]]) -> np.ndarray:
+    """
+    One row per entry of `copied`: the copied vector where there is one,
+    otherwise the next row of `fresh`, in order.
+    """
+    merged = np.empty((len(copied), settings.VECTOR_SIZE), dtype=fresh.dtype)
+    rows = iter(fresh)
+    for idx, vector in enumerate(copied):
+        merged[idx] = vector if vector is not None else next(rows)
+    return merged
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """Count model tokens per text with one batched tokenizer call."""
+    if not texts:
+        return []
+    encoded = model_registry.get("tokenizer")(list(texts), add_special_tokens=False)["input_ids"]
+    return [len(ids) for ids in encoded]
 
-model = SentenceTransformer("intfloat/multilingual-e5-large")
 
 async def embed_text(text: str, is_query: bool = False):
     """
@@ -9,20 +182,109 @@ async def embed_text(text: str, is_query: bool = False):
     - Automatically adds 'query:' or 'passage:' prefix.
     - Supports both Arabic and English input.
     """
-    loop = asyncio.get_event_loop()
-    
     # Add the appropriate prefix for E5 models
-    prefix = "query: " if is_query else "passage: "
+    prefix = QUERY_PREFIX if is_query else PASSAGE_PREFIX
     formatted_text = prefix + text.strip()
-    
-    # Encode asynchronously to avoid blocking event loop
-    embedding = await loop.run_in_executor(
-        None,
-        lambda: model.encode(
-            formatted_text,
-            normalize_embeddings=True,
-            convert_to_numpy=True
-        )
-    )
-    
-    return embedding.tolist()
+
+    # Encode in a worker thread to avoid blocking event loop
+    embeddings = await asyncio.to_thread(_encode, [formatted_text], 1)
+
+    return embeddings[0].tolist()
+
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesce concurrent query embeddings into batched encodes.
+    Requests are collected for up to `max_wait_ms` or until `max_batch_size`
+    items are queued, encoded together, and each caller's future is resolved.
+    """
+
+    def __init__(self, max_wait_ms: Optional[float] = None, max_batch_size: Optional[int] = None):
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.QUERY_BATCH_MAX_WAIT_MS) / 1000
+        self.max_batch_size = max_batch_size or settings.QUERY_BATCH_MAX_SIZE
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # batch fill metrics
+        self.batches = 0
+        self.items = 0
+        self.fill_histogram: Counter = Counter()
+
+    def _ensure_worker(self):
+        """Start the collector task on the running event loop if needed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, query: str) -> List[float]:
+        """Queue a query for the next batch and wait for its embedding."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first request, then gather more until the window closes."""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Drop callers that gave up while waiting
+        return [(query, future) for query, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            texts = [QUERY_PREFIX + query.strip() for query, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(_encode, texts, len(texts))
+            except Exception as e:
+                logger.error(f"Query embedding batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding.tolist())
+
+            self.batches += 1
+            self.items += len(batch)
+            self.fill_histogram[len(batch)] += 1
+
+    def stats(self) -> dict:
+        """Return batch fill metrics."""
+        avg_fill = self.items / self.batches if self.batches else 0.0
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(avg_fill, 2),
+            "avg_fill_ratio": round(avg_fill / self.max_batch_size, 3),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "fill_histogram": dict(sorted(self.fill_histogram.items())),
+        }
+
+
+# Singleton batcher
+query_batcher = QueryEmbeddingBatcher()
+
+
+async def embed_query(query: str) -> List[float]:
+    """Embed a search query through the shared micro-batcher."""
+    return await query_batcher.embed(query)
@@ -0,0 +1,295 @@
+"""
+Shared inference server: one process holds the embedding model and the
+EasyOCR reader, and every API worker talks to it over a Unix socket instead
+of loading its own copy. Embed requests from all workers are coalesced into
+batches, so concurrent workers also share batching.
+
+    python -m app.services.inference_server
+
+Frames are a 4-byte big-endian header length, a JSON header and a raw byte
+payload of header["payload_size"] bytes (vectors and images travel as raw
+arrays, described by shape/dtype in the header).
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+HEADER_SIZE = struct.Struct("!I")
+
+
+def encode_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    data = json.dumps({**header, "payload_size": len(payload)}, ensure_ascii=False).encode("utf-8")
+    return HEADER_SIZE.pack(len(data)) + data + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    (size,) = HEADER_SIZE.unpack(await reader.readexactly(HEADER_SIZE.size))
+    header = json.loads(await reader.readexactly(size))
+    payload = await reader.readexactly(header["payload_size"]) if header.get("payload_size") else b""
+    return header, payload
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Inference server closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+# ------------------ SERVER ------------------
+class InferenceServer:
+    """Serve batched embed and ocr requests on a Unix socket"""
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        max_wait_ms: Optional[float] = None,
+        max_batch: Optional[int] = None,
+    ):
+        self.socket_path = str(socket_path or settings.INFERENCE_SOCKET_PATH)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.INFERENCE_BATCH_WAIT_MS) / 1000
+        self.max_batch = max_batch or settings.INFERENCE_MAX_BATCH
+        self._embed_queue: Optional[asyncio.Queue] = None
+        # EasyOCR is not safe to call from several threads at once
+        self._ocr_lock = asyncio.Lock()
+
+        # batch metrics
+        self.batches = 0
+        self.requests = 0
+
+    async def _collect(self) -> List[tuple]:
+        """Wait for one embed request, then gather more until the window closes or the batch is full"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._embed_queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._embed_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _embed_worker(self):
+        from app.services.embeddings import _encode_local
+
+        while True:
+            batch = await self._collect()
+            texts = [text for item in batch for text in item[0]]
+            batch_size = max(item[1] for item in batch)
+            try:
+                embeddings = await asyncio.to_thread(_encode_local, texts, batch_size)
+            except Exception as e:
+                logger.error(f"Embedding batch failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for item_texts, _, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[start:start + len(item_texts)])
+                start += len(item_texts)
+
+            self.batches += 1
+            self.requests += len(batch)
+
+    async def _embed(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        texts = header["texts"]
+        if not texts:
+            embeddings = np.empty((0, settings.VECTOR_SIZE), dtype=np.float32)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            await self._embed_queue.put((texts, header.get("batch_size") or settings.EMBEDDING_BATCH_SIZE, future))
+            embeddings = await future
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        return {"ok": True, "shape": list(embeddings.shape), "dtype": "float32"}, embeddings.tobytes()
+
+    async def _ocr(self, header: Dict[str, Any], payload: bytes) -> Tuple[Dict[str, Any], bytes]:
+        from app.services.model_registry import model_registry
+
+        if header.get("path"):
+            image = header["path"]
+        else:
+            image = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+
+        async with self._ocr_lock:
+            result = await asyncio.to_thread(model_registry.get("easyocr").readtext, image, detail=0)
+        return {"ok": True, "text": "\n".join(result).strip()}, b""
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection; requests on a connection are answered in order"""
+        try:
+            while True:
+                try:
+                    header, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = header.get("op")
+                try:
+                    if op == "embed":
+                        response, data = await self._embed(header)
+                    elif op == "ocr":
+                        response, data = await self._ocr(header, payload)
+                    elif op == "ping":
+                        response, data = {"ok": True, "batches": self.batches, "requests": self.requests}, b""
+                    else:
+                        response, data = {"ok": False, "error": f"Unknown op: {op}"}, b""
+                except Exception as e:
+                    logger.error(f"Inference request '{op}' failed: {e}")
+                    response, data = {"ok": False, "error": str(e)}, b""
+
+                writer.write(encode_frame(response, data))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Load the models and serve until cancelled"""
+        from app.services.model_registry import model_registry
+        import app.services.embeddings  # noqa: F401, registers the embedding model
+        import app.agents.document_parser.tools.easy_ocr  # noqa: F401, registers the EasyOCR reader
+
+        await model_registry.warm_up(["embedding", "easyocr"])
+
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # stale socket from a previous run
+
+        self._embed_queue = asyncio.Queue()
+        worker = asyncio.create_task(self._embed_worker())
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Inference server listening on {self.socket_path}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+# ------------------ CLIENT ------------------
+class InferenceClient:
+    """
+    Blocking client of the inference server. Calls come from worker threads
+    (asyncio.to_thread), so each thread keeps its own persistent connection.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.socket_path = str(socket_path or settings.INFERENCE_SOCKET_PATH)
+        self.timeout = timeout or settings.INFERENCE_TIMEOUT
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, header: Dict[str, Any], payload: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        frame = encode_frame(header, payload)
+        for attempt in range(2):
+            received = False
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                (size,) = HEADER_SIZE.unpack(_recv_exactly(sock, HEADER_SIZE.size))
+                received = True
+                response = json.loads(_recv_exactly(sock, size))
+                data = _recv_exactly(sock, response["payload_size"]) if response.get("payload_size") else b""
+                break
+            except socket.timeout:
+                # The server may still be working on it; resending would double the work
+                self._close()
+                raise
+            except OSError:
+                # The server may have restarted and dropped the connection;
+                # resend once, unless it had already started answering
+                self._close()
+                if attempt or received:
+                    raise
+        if not response.get("ok"):
+            raise RuntimeError(f"Inference server error: {response.get('error')}")
+        return response, data
+
+    def embed(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Embed already-prefixed texts, returning a float32 matrix"""
+        response, data = self._request({"op": "embed", "texts": list(texts), "batch_size": batch_size})
+        return np.frombuffer(data, dtype=response["dtype"]).reshape(response["shape"]).copy()
+
+    def ocr(self, image: Union[str, np.ndarray]) -> str:
+        """OCR an image file path or pixel array with the server's EasyOCR reader"""
+        if isinstance(image, str):
+            response, _ = self._request({"op": "ocr", "path": os.path.abspath(image)})
+        else:
+            image = np.ascontiguousarray(image)
+            response, _ = self._request(
+                {"op": "ocr", "shape": list(image.shape), "dtype": str(image.dtype)}, image.tobytes()
+            )
+        return response["text"]
+
+    def ping(self) -> bool:
+        """Whether the server is reachable"""
+        try:
+            self._request({"op": "ping"})
+            return True
+        except Exception:
+            return False
+
+
+# Singleton client
+inference_client = InferenceClient()
+
+
+def main():
+    server = InferenceServer()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve())
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+        logger.info("Inference server stopped")
+
+
+if __name__ == "__main__":
+    main()
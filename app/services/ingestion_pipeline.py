@@ -0,0 +1,273 @@
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from app.core.settings import settings
+from app.services.chunker import Chunker
+from app.services.concurrency import stage_limits
+from app.services.document_index import hash_text
+from app.services.embeddings import embed_passages, merge_vectors
+from app.services.qdrant_client import qdrant_manager, ingestion_timestamp
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+# Characters of leading text handed to the category predictor
+CATEGORY_TEXT_LIMIT = 5000
+
+
+class StreamingIngestion:
+    """
+    Streaming ingestion of one document:
+    extract blocks -> chunk -> embed batch -> upsert batch.
+    Stages are connected by bounded queues, so embedding of early pages
+    overlaps extraction (and OCR) of later ones and memory stays flat.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        original_filename: str,
+        reusable_points: Optional[Dict[str, List[str]]] = None,
+        replace: bool = False,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.file_path = file_path
+        self.original_filename = original_filename
+        self.ingested_at = ingestion_timestamp()
+        # chunk hash -> point ids of the earlier document under this filename.
+        # A replaced document hands its points over (the rest are deleted at
+        # the end); otherwise it keeps them and only their vectors are copied
+        self.reusable_points = reusable_points or {}
+        self.replace = replace
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+
+        queue_size = queue_size or settings.STREAM_QUEUE_SIZE
+        self._blocks = asyncio.Queue(maxsize=queue_size)
+        self._chunks = asyncio.Queue(maxsize=queue_size * self.batch_size)
+        self._batches = asyncio.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+
+        self._head_parts: List[str] = []
+        self._head_length = 0
+        self._head_ready = asyncio.Event()
+
+        self.category: Optional[str] = None
+        self.rows: List[Dict[str, Any]] = []
+        # Points created by this run, deleted again if the run fails
+        self.written_point_ids: List[str] = []
+        self.extraction_methods = set()
+        self.block_count = 0
+        self.chunk_count = 0
+        self.embedded_count = 0
+        self.reused_count = 0
+
+    @property
+    def head_text(self) -> str:
+        return "".join(self._head_parts)[:CATEGORY_TEXT_LIMIT]
+
+    async def run(
+        self,
+        blocks: Iterator[Dict[str, Any]],
+        categorize: Optional[Callable[[str], Awaitable[str]]] = None,
+    ) -> Dict[str, Any]:
+        """Run all stages to completion and return counts"""
+        if not qdrant_manager.is_connected:
+            # Points are built in the collection's vector layout
+            await qdrant_manager.connect()
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._extract_stage(blocks))
+                group.create_task(self._chunk_stage())
+                group.create_task(self._embed_stage())
+                group.create_task(self._store_stage())
+                if categorize:
+                    group.create_task(self._categorize(categorize))
+        except ExceptionGroup as e:
+            # Do not leave a partial document searchable; the job is retried
+            # from scratch. Surface the stage error that stopped the pipeline
+            await self._delete_written_points()
+            raise e.exceptions[0]
+        finally:
+            # Unblock the extractor thread if a later stage failed
+            self._stop.set()
+
+        if self.category:
+            await qdrant_manager.set_file_payload(self.file_path, {"file_category": self.category})
+
+        # Points of a replaced document that were not reused are stale
+        stale = []
+        if self.replace:
+            stale = [point_id for point_ids in self.reusable_points.values() for point_id in point_ids]
+            await qdrant_manager.delete_points(stale)
+
+        logger.info(
+            f"Streaming ingestion completed: {self.block_count} blocks, {self.chunk_count} chunks, "
+            f"{self.embedded_count} embedded, {self.reused_count} reused, {len(stale)} stale"
+        )
+        return {
+            "blocks": self.block_count,
+            "chunks": self.chunk_count,
+            "embedded": self.embedded_count,
+            "reused": self.reused_count,
+            "deleted": len(stale),
+        }
+
+    # ------------------ STAGES ------------------
+    async def _extract_stage(self, blocks: Iterator[Dict[str, Any]]):
+        """Drive the blocking block generator in a thread with backpressure"""
+        loop = asyncio.get_running_loop()
+
+        def _put(item) -> bool:
+            future = asyncio.run_coroutine_threadsafe(self._blocks.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except FutureTimeoutError:
+                    if self._stop.is_set():
+                        future.cancel()
+                        return False
+
+        def _produce():
+            for block in blocks:
+                if self._stop.is_set() or not _put(block):
+                    return
+
+        try:
+            async with stage_limits.extraction:
+                await asyncio.to_thread(_produce)
+            await self._blocks.put(_DONE)
+        finally:
+            self._stop.set()
+
+    async def _chunk_stage(self):
+        # One chunker for the whole document, so chunks can span page breaks
+        chunker = Chunker()
+        chunk_index = 0
+
+        async def _emit(chunks: List[Dict[str, Any]]):
+            nonlocal chunk_index
+            for chunk in chunks:
+                if chunk["text"]:
+                    await self._chunks.put({**chunk, "chunk_index": chunk_index})
+                    chunk_index += 1
+
+        while (block := await self._blocks.get()) is not _DONE:
+            self.block_count += 1
+            self.extraction_methods.add("ocr" if block.get("ocr") else "text")
+            self._collect_head(block["text"])
+            await _emit(await asyncio.to_thread(chunker.feed, block["text"] or "", block.get("page")))
+
+        await _emit(chunker.finish())
+        self.chunk_count = chunk_index
+        self._head_ready.set()
+        await self._chunks.put(_DONE)
+
+    async def _embed_stage(self):
+        batch = []
+        while True:
+            item = await self._chunks.get()
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (item is _DONE or len(batch) >= self.batch_size):
+                await self._batches.put(await self._embed_batch(batch))
+                batch = []
+            if item is _DONE:
+                break
+        await self._batches.put(_DONE)
+
+    async def _embed_batch(self, batch: List[Dict[str, Any]]):
+        """Embed the chunks of a batch that cannot reuse a previous point or vector"""
+        for item in batch:
+            item["chunk_hash"] = hash_text(item["text"])
+            point_ids = self.reusable_points.get(item["chunk_hash"])
+            item["point_id"] = point_ids.pop() if point_ids else None
+
+        copied = [None] * len(batch)
+        if not self.replace and any(item["point_id"] for item in batch):
+            vectors = await qdrant_manager.get_vectors([item["point_id"] for item in batch if item["point_id"]])
+            copied = [vectors.get(item["point_id"]) if item["point_id"] else None for item in batch]
+            for item in batch:
+                item["point_id"] = None
+
+        new_items = [item for item in batch if item["point_id"] is None]
+        new_copied = [vector for item, vector in zip(batch, copied) if item["point_id"] is None]
+        to_embed = [item for item, vector in zip(new_items, new_copied) if vector is None]
+        embeddings = await embed_passages([item["text"] for item in to_embed])
+        if any(vector is not None for vector in new_copied):
+            embeddings = merge_vectors(embeddings, new_copied)
+
+        self.embedded_count += len(to_embed)
+        self.reused_count += len(batch) - len(to_embed)
+        return batch, new_items, embeddings
+
+    async def _store_stage(self):
+        while (item := await self._batches.get()) is not _DONE:
+            batch, new_items, embeddings = item
+
+            points = []
+            for entry, vector in zip(new_items, embeddings.tolist()):
+                entry["point_id"] = str(uuid4())
+                points.append(qdrant_manager.make_point(entry["point_id"], vector, self._payload(entry)))
+            # Recorded before the upsert, which can fail after writing part of the batch
+            self.written_point_ids.extend(point.id for point in points)
+            await qdrant_manager.upsert_points(points)
+
+            new_ids = {entry["point_id"] for entry in new_items}
+            await qdrant_manager.set_payloads({
+                entry["point_id"]: self._payload(entry) for entry in batch if entry["point_id"] not in new_ids
+            })
+
+            self.rows.extend(
+                {"chunk_hash": entry["chunk_hash"], "point_id": entry["point_id"]} for entry in batch
+            )
+
+    async def _categorize(self, categorize: Callable[[str], Awaitable[str]]):
+        """Predict the category from the leading text while ingestion continues"""
+        await self._head_ready.wait()
+        if not self.head_text.strip():
+            # Nothing was extracted, there is nothing to classify
+            logger.warning("No document text available for category prediction.")
+            self.category = "Other"
+            return
+        try:
+            self.category = await categorize(self.head_text)
+        except Exception as e:
+            logger.error(f"Category prediction failed: {str(e)}")
+
+    # ------------------ HELPERS ------------------
+    async def _delete_written_points(self):
+        """Remove the points this run created, keeping the original error if that fails too"""
+        try:
+            await qdrant_manager.delete_points(self.written_point_ids)
+            logger.info(f"Deleted {len(self.written_point_ids)} points of the failed ingestion")
+        except Exception as e:
+            logger.error(f"Deleting points of the failed ingestion failed: {str(e)}")
+
+    def _collect_head(self, text: str):
+        if self._head_length < CATEGORY_TEXT_LIMIT:
+            self._head_parts.append(text + "\n")
+            self._head_length += len(text) + 1
+            if self._head_length >= CATEGORY_TEXT_LIMIT:
+                self._head_ready.set()
+
+    def _payload(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "file_category": self.category,
+            "file_path": self.file_path,
+            "original_filename": self.original_filename,
+            "ingested_at": self.ingested_at,
+            "chunk_index": entry["chunk_index"],
+            "page_start": entry["page_start"],
+            "page_end": entry["page_end"],
+            "char_start": entry["char_start"],
+            "char_end": entry["char_end"],
+            "chunk_text": entry["text"],
+        }
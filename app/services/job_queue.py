@@ -0,0 +1,361 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from uuid import uuid4
+
+from app.core.settings import settings
+from app.services.artifact_store import artifact_store
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Job statuses after which a job no longer changes
+FINAL_STATUSES = ("success", "failed", "duplicate")
+
+
+class JobQueue:
+    """Durable SQLite-backed ingestion job queue drained by a pool of asyncio workers"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        original_filename TEXT,
+        content_hash TEXT,
+        status TEXT NOT NULL,
+        stages TEXT NOT NULL DEFAULT '{}',
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        replace_previous INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        lease_until REAL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+    """
+    # Columns added after the first release, for existing databases
+    MIGRATIONS = {
+        "replace_previous": "ALTER TABLE jobs ADD COLUMN replace_previous INTEGER NOT NULL DEFAULT 0",
+        "owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+        "lease_until": "ALTER TABLE jobs ADD COLUMN lease_until REAL",
+    }
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or settings.JOB_QUEUE_PATH)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._graph = None
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        # Identifies this process as the lease holder of the jobs it runs
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in self.MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+        return self._conn
+
+    def _run(self, fn, *args):
+        """Run a database call under the connection lock"""
+        with self._lock:
+            return fn(self._connection(), *args)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["stages"] = json.loads(job["stages"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ------------------ QUEUE ------------------
+    async def enqueue(
+        self,
+        file_path: str,
+        original_filename: str,
+        content_hash: Optional[str] = None,
+        replace: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Persist a new job and wake up an idle worker. With replace=True the
+        document replaces the latest one uploaded under the same filename.
+        """
+        job_id = uuid4().hex
+
+        def _insert(conn, job_id):
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, file_path, original_filename, content_hash, replace_previous, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                    (job_id, str(file_path), original_filename, content_hash, int(replace), time.time()),
+                )
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+        job = await asyncio.to_thread(self._run, _insert, job_id)
+        if self._wakeup:
+            self._wakeup.set()
+        logger.info(f"Enqueued job {job_id} for {original_filename}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job by id"""
+        def _get(conn, job_id):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._to_dict(row) if row else None
+
+        return await asyncio.to_thread(self._run, _get, job_id)
+
+    async def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent jobs, optionally filtered by status"""
+        def _list(conn, status, limit):
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            return [self._to_dict(row) for row in rows]
+
+        return await asyncio.to_thread(self._run, _list, status, limit)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait until a job reaches a final status (or the timeout) and return it"""
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINAL_STATUSES:
+                return job
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._finished.pop(job_id, None)
+        return await self.get(job_id)
+
+    @staticmethod
+    def _requeue_expired(conn: sqlite3.Connection) -> int:
+        """Requeue running jobs whose lease holder stopped renewing it"""
+        return conn.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+            "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+            (time.time(),),
+        ).rowcount
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the oldest queued job to running under this process's
+        lease. The write lock is taken before reading (BEGIN IMMEDIATE), so
+        workers in other processes cannot claim the same job. Jobs for content
+        or a filename that is already being processed wait, so concurrent
+        workers never ingest the same document (or two versions of it) at once.
+        """
+        def _claim(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._requeue_expired(conn)
+                row = conn.execute(
+                    """
+                    SELECT * FROM jobs WHERE status = 'queued'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM jobs AS running WHERE running.status = 'running'
+                        AND (running.content_hash = jobs.content_hash
+                             OR running.original_filename = jobs.original_filename)
+                    )
+                    ORDER BY created_at LIMIT 1
+                    """
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                    "owner = ?, lease_until = ? WHERE id = ?",
+                    (now, self.owner, now + settings.JOB_LEASE_SECONDS, row["id"]),
+                )
+            return self._to_dict(row)
+
+        return await asyncio.to_thread(self._run, _claim)
+
+    async def _renew_lease(self, job_id: str):
+        """Extend the lease of a running job until cancelled"""
+        def _renew(conn, job_id):
+            with conn:
+                return conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                    (time.time() + settings.JOB_LEASE_SECONDS, job_id, self.owner),
+                ).rowcount
+
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                if not await asyncio.to_thread(self._run, _renew, job_id):
+                    logger.warning(f"Lost the lease of job {job_id}")
+                    return
+            except Exception as e:
+                logger.error(f"Failed to renew the lease of job {job_id}: {e}")
+
+    async def _update(self, job_id: str, **fields):
+        """Update job columns, serialising JSON fields"""
+        for key in ("stages", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key], default=str)
+
+        def _update(conn, job_id):
+            with conn:
+                conn.execute(
+                    f"UPDATE jobs SET {', '.join(f'{key} = ?' for key in fields)} WHERE id = ?",
+                    (*fields.values(), job_id),
+                )
+
+        await asyncio.to_thread(self._run, _update, job_id)
+
+    # ------------------ WORKERS ------------------
+    async def start(self, graph, workers: Optional[int] = None):
+        """
+        Requeue jobs whose process died and start the worker pool. Jobs with a
+        live lease belong to another running process and are left alone.
+        """
+        def _recover(conn):
+            with conn:
+                return self._requeue_expired(conn)
+
+        recovered = await asyncio.to_thread(self._run, _recover)
+        if recovered:
+            logger.info(f"Requeued {recovered} interrupted jobs")
+
+        self._graph = graph
+        self._wakeup = asyncio.Event()
+        workers = workers or settings.INGEST_WORKERS
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(workers)]
+        logger.info(f"Started {workers} ingestion workers")
+
+    async def stop(self):
+        """Cancel the worker pool and hand this process's running jobs back to the queue"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        def _release(conn):
+            with conn:
+                return conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+                    "WHERE status = 'running' AND owner = ?",
+                    (self.owner,),
+                ).rowcount
+
+        released = await asyncio.to_thread(self._run, _release)
+        logger.info(f"Ingestion workers stopped, requeued {released} running jobs")
+
+    async def _worker(self, worker_id: int):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]):
+        """Run the document parser graph for a job, recording per-stage status and timings"""
+        from app.agents.document_parser.graph import STAGE_STATUS_FIELDS  # Import here to avoid circular dependency
+
+        job_id = job["id"]
+        logger.info(f"Processing job {job_id} ({job['original_filename']})")
+
+        initial_state = {
+            "file_path": job["file_path"],
+            "original_filename": job["original_filename"],
+            "content_hash": job["content_hash"],
+            "replace": bool(job.get("replace_previous")),
+        }
+        config = {"configurable": {"thread_id": job_id}}
+
+        stages: Dict[str, Dict[str, Any]] = {}
+        state: Dict[str, Any] = {}
+        last = time.perf_counter()
+        lease = asyncio.create_task(self._renew_lease(job_id))
+
+        try:
+            async for update in self._graph.astream(initial_state, config=config, stream_mode="updates"):
+                for node, values in update.items():
+                    now = time.perf_counter()
+                    values = values or {}
+                    state.update(values)
+                    stages[node] = {
+                        "status": values.get(STAGE_STATUS_FIELDS.get(node, ""), "done"),
+                        "duration": round(now - last, 3),
+                    }
+                    last = now
+                await self._update(job_id, stages=stages)
+
+            if state.get("dedup_status") == "duplicate":
+                status = "duplicate"
+            elif any(stage["status"] == "failed" for stage in stages.values()):
+                status = "failed"
+            else:
+                status = "success"
+
+            await self._update(
+                job_id,
+                status=status,
+                stages=stages,
+                result={
+                    "predicted_category": state.get("predicted_category"),
+                    "extraction_method": state.get("extraction_method"),
+                },
+                finished_at=time.time(),
+            )
+            logger.info(f"Job {job_id} finished: {status}")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await self._update(job_id, status="failed", stages=stages, error=str(e), finished_at=time.time())
+        finally:
+            lease.cancel()
+            # Intermediate results of a run that stopped early
+            artifact_store.release(job_id)
+            # Job status lives in the queue, the run's checkpoints are never read back
+            if self._graph.checkpointer:
+                await self._graph.checkpointer.adelete_thread(job_id)
+
+        event = self._finished.get(job_id)
+        if event:
+            event.set()
+
+        # Jobs held back behind this one can now be claimed
+        self._wakeup.set()
+
+
+# Singleton queue
+job_queue = JobQueue()
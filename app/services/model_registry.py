@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Process roles and what they serve; "all" serves both
+APP_ROLES = ("all", "chat", "ingest")
+
+
+class ModelRegistry:
+    """
+    Registry of heavy models loaded on first use instead of at import time.
+    Modules register a loader and the roles that need the model; the app
+    warms the models of its role in the background at startup and reports
+    readiness once they are loaded. A model outside the role is still loaded
+    on demand if something ends up using it.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._roles: Dict[str, set] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._loading: set = set()
+        self._load_seconds: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._warmup: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Callable[[], Any], roles: Iterable[str] = ("chat", "ingest")):
+        """Register a model loader; nothing is loaded yet"""
+        self._loaders[name] = loader
+        self._roles[name] = set(roles)
+        self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use (thread-safe, loads once)"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            if name not in self._models:
+                self._loading.add(name)
+                started = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                    self._errors.pop(name, None)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.error(f"Failed to load model '{name}': {e}")
+                    raise
+                finally:
+                    self._loading.discard(name)
+                self._load_seconds[name] = round(time.perf_counter() - started, 2)
+                logger.info(f"Loaded model '{name}' in {self._load_seconds[name]}s")
+        return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def required(self, role: Optional[str] = None) -> List[str]:
+        """Models used by a role"""
+        role = role or settings.APP_ROLE
+        return [
+            name for name, roles in self._roles.items()
+            if role in roles or (role == "all" and roles)
+        ]
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Load models one after another in a worker thread, shared models first"""
+        if names is None:
+            names = sorted(self.required(), key=lambda name: -len(self._roles[name]))
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception:
+                # Already logged; readiness reports the failure
+                pass
+
+    def start_warmup(self, names: Optional[Iterable[str]] = None) -> asyncio.Task:
+        """Warm models in the background so startup does not wait for them"""
+        self._warmup = asyncio.get_running_loop().create_task(self.warm_up(names))
+        return self._warmup
+
+    async def stop_warmup(self):
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+            try:
+                await self._warmup
+            except asyncio.CancelledError:
+                pass
+
+    def ready(self, role: Optional[str] = None) -> bool:
+        """
+        Ready once the role's models are loaded; without warm-up models load
+        on first use, so only failures count against readiness
+        """
+        required = self.required(role)
+        if any(name in self._errors for name in required):
+            return False
+        if not settings.MODEL_WARMUP:
+            return True
+        return all(name in self._models for name in required)
+
+    def status(self, role: Optional[str] = None) -> Dict[str, Any]:
+        """Per-model load state"""
+        required = set(self.required(role))
+        models = {}
+        for name in self._loaders:
+            if name in self._models:
+                state = "loaded"
+            elif name in self._errors:
+                state = "failed"
+            elif name in self._loading:
+                state = "loading"
+            else:
+                state = "pending" if name in required else "not_required"
+            models[name] = {
+                "state": state,
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+        return models
+
+
+# Singleton registry
+model_registry = ModelRegistry()
@@ -0,0 +1,95 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Sequence
+
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from app.core.settings import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(tesseract_cmd: str):
+    """Configure Tesseract in each worker process"""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _ocr_page(input_path: str, page: int, dpi: int, lang: str) -> str:
+    """Render a single page and OCR it inside a worker process"""
+    images = convert_from_path(input_path, dpi=dpi, first_page=page, last_page=page)
+    try:
+        return pytesseract.image_to_string(images[0], lang=lang) if images else ""
+    finally:
+        for image in images:
+            image.close()
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Return the shared Tesseract worker pool, sized to the cores by default"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = ocr_worker_count()
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(settings.TESSERACT_CMD,),
+            )
+            logger.info(f"Started OCR process pool with {workers} workers")
+        return _pool
+
+
+def ocr_worker_count() -> int:
+    """Return the configured number of OCR worker processes"""
+    return settings.OCR_WORKERS or os.cpu_count() or 1
+
+
+def shutdown_ocr_pool():
+    """Stop the worker pool if it was started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+            logger.info("OCR process pool shut down")
+
+
+def get_page_count(input_path: str) -> int:
+    """Return the number of pages in a PDF"""
+    return int(pdfinfo_from_path(input_path)["Pages"])
+
+
+def submit_ocr_page(input_path: str, page: int, dpi: Optional[int] = None, lang: Optional[str] = None) -> Future:
+    """Queue a single 1-based page for OCR and return its future"""
+    return get_ocr_pool().submit(
+        _ocr_page, input_path, page, dpi or settings.OCR_DPI, lang or settings.OCR_LANG
+    )
+
+
+def ocr_pdf_pages(
+    input_path: str,
+    pages: Optional[Sequence[int]] = None,
+    dpi: Optional[int] = None,
+    lang: Optional[str] = None,
+) -> List[str]:
+    """
+    OCR PDF pages in parallel and return their text in page order.
+    Pages are 1-based and rendered one at a time inside the workers,
+    so memory is bounded by the number of workers, not the page count.
+    """
+    if pages is None:
+        pages = range(1, get_page_count(input_path) + 1)
+
+    dpi = dpi or settings.OCR_DPI
+    lang = lang or settings.OCR_LANG
+
+    pool = get_ocr_pool()
+    return list(pool.map(_ocr_page, repeat(input_path), pages, repeat(dpi), repeat(lang)))
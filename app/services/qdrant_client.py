@@ -1,17 +1,100 @@
 import asyncio
+import time
 from datetime import datetime
 from contextlib import asynccontextmanager
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 from uuid import uuid4
+import numpy as np
 from langchain_core.messages import HumanMessage, AIMessage
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, VectorParams
+from qdrant_client.http.models import (
+    PointStruct, Filter, FieldCondition, MatchValue, MatchAny, Range, VectorParams,
+    SetPayload, SetPayloadOperation, PointIdsList, PayloadSchemaType,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, SearchParams, QuantizationSearchParams,
+    SparseVectorParams, SparseIndexParams, Modifier, Prefetch, FusionQuery, Fusion,
+)
 
 from app.core.settings import settings
+from app.services.concurrency import stage_limits
+from app.services.sparse import sparse_document_vector, sparse_query_vector
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Named vectors of hybrid collections
+DENSE_VECTOR = "dense"
+SPARSE_VECTOR = "sparse"
+
+# Payload fields used in search filters and bulk payload updates
+PAYLOAD_INDEXES = {
+    "file_category": PayloadSchemaType.KEYWORD,
+    "file_path": PayloadSchemaType.KEYWORD,
+    "original_filename": PayloadSchemaType.KEYWORD,
+    "ingested_at": PayloadSchemaType.INTEGER,
+}
+
+
+def ingestion_timestamp() -> int:
+    """Unix time in seconds stored as the integer ingested_at payload field"""
+    return int(time.time())
+
+
+def quantization_config():
+    """Quantization for new collections from settings, None keeps full vectors only"""
+    mode = settings.QDRANT_QUANTIZATION.lower()
+    if mode == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8,
+            quantile=0.99,
+            always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+        ))
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(
+            always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM,
+        ))
+    if mode != "none":
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION: {settings.QDRANT_QUANTIZATION}")
+    return None
+
+
+def search_params() -> Optional[SearchParams]:
+    """Per-query HNSW and quantization parameters from settings"""
+    quantization = None
+    if settings.QDRANT_QUANTIZATION.lower() != "none":
+        # Search the quantized vectors, then rescore the oversampled top hits
+        # with the original vectors to recover most of the lost precision
+        quantization = QuantizationSearchParams(
+            rescore=settings.QDRANT_RESCORE,
+            oversampling=settings.QDRANT_OVERSAMPLING,
+        )
+    if quantization is None and not settings.QDRANT_HNSW_EF:
+        return None
+    return SearchParams(hnsw_ef=settings.QDRANT_HNSW_EF or None, quantization=quantization)
+
+
+def build_filter(filters: Optional[Dict[str, Any]]) -> Optional[Filter]:
+    """
+    Translate search filters into a Qdrant filter. Supported keys:
+    categories, filenames, file_paths (lists matched with any-of) and
+    ingested_after / ingested_before (unix seconds, inclusive).
+    """
+    if not filters:
+        return None
+
+    conditions = []
+    for key, field in (("categories", "file_category"), ("filenames", "original_filename"), ("file_paths", "file_path")):
+        values = filters.get(key)
+        if values:
+            conditions.append(FieldCondition(key=field, match=MatchAny(any=list(values))))
+
+    after, before = filters.get("ingested_after"), filters.get("ingested_before")
+    if after is not None or before is not None:
+        conditions.append(FieldCondition(key="ingested_at", range=Range(gte=after, lte=before)))
+
+    return Filter(must=conditions) if conditions else None
+
+
 class AsyncQdrantManager:
     """Async Qdrant manager with structured pool-like behavior"""
     def __init__(self, **kwargs):
@@ -20,6 +103,9 @@ class AsyncQdrantManager:
         self._client: Optional[AsyncQdrantClient] = None
         self._lock = asyncio.Lock()
         self.collection_name = settings.COLLECTION_NAME
+        # Whether the collection has dense + sparse named vectors; legacy
+        # collections with a single unnamed vector are searched dense-only
+        self.hybrid = False
 
 
     async def connect(self):
@@ -27,10 +113,14 @@ class AsyncQdrantManager:
         async with self._lock:
             if self._client is None:
                 try:
-                    self._client = AsyncQdrantClient(
-                        url=self.url,
-                        # api_key=self.api_key
-                    )
+                    if self.url == ":memory:":
+                        # Local in-process stand-in, useful for tests
+                        self._client = AsyncQdrantClient(location=":memory:")
+                    else:
+                        self._client = AsyncQdrantClient(
+                            url=self.url,
+                            # api_key=self.api_key
+                        )
 
                     await self._ensure_collection(self.collection_name, settings.VECTOR_SIZE, settings.DISTANCE)
                     logger.info("Qdrant connection established")
@@ -50,48 +140,293 @@ class AsyncQdrantManager:
     def is_connected(self) -> bool:
         return self._client is not None
 
-    async def _ensure_collection(self, collection_name: str, dim: int, distance):
-        """Create collection if missing"""
+    async def collection_exists(self, collection_name: str) -> bool:
+        """Whether a collection or an alias with this name exists"""
         collections = await self._client.get_collections()
-        if collection_name not in [c.name for c in collections.collections]:
-            await self._client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=dim,  # your embedding dimension
-                    distance=distance
-                )
+        if collection_name in [c.name for c in collections.collections]:
+            return True
+        aliases = await self._client.get_aliases()
+        return collection_name in [a.alias_name for a in aliases.aliases]
+
+    async def create_collection(self, collection_name: str, dim: int, distance, hybrid: Optional[bool] = None):
+        """Create a collection with the storage, HNSW and quantization settings"""
+        hybrid = settings.HYBRID_SEARCH if hybrid is None else hybrid
+        dense = VectorParams(
+            size=dim,  # your embedding dimension
+            distance=distance,
+            on_disk=settings.QDRANT_ON_DISK_VECTORS,
+        )
+        await self._client.create_collection(
+            collection_name=collection_name,
+            vectors_config={DENSE_VECTOR: dense} if hybrid else dense,
+            sparse_vectors_config={
+                # Qdrant applies the BM25 IDF term from its own collection statistics
+                SPARSE_VECTOR: SparseVectorParams(
+                    index=SparseIndexParams(on_disk=settings.QDRANT_ON_DISK_VECTORS),
+                    modifier=Modifier.IDF,
+                ),
+            } if hybrid else None,
+            hnsw_config=HnswConfigDiff(
+                m=settings.QDRANT_HNSW_M,
+                ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT,
+            ),
+            quantization_config=quantization_config(),
+            on_disk_payload=settings.QDRANT_ON_DISK_PAYLOAD,
+        )
+        logger.info(f"Collection '{collection_name}' created{' with hybrid vectors' if hybrid else ''}")
+
+    async def is_hybrid(self, collection_name: str) -> bool:
+        """Whether a collection stores the dense and sparse named vectors"""
+        params = (await self._client.get_collection(collection_name)).config.params
+        return (
+            isinstance(params.vectors, dict) and DENSE_VECTOR in params.vectors
+            and SPARSE_VECTOR in (params.sparse_vectors or {})
+        )
+
+    async def _ensure_collection(self, collection_name: str, dim: int, distance):
+        """Create collection if missing and make sure the payload indexes exist"""
+        if not await self.collection_exists(collection_name):
+            await self.create_collection(collection_name, dim, distance)
+
+        self.hybrid = await self.is_hybrid(collection_name)
+        if settings.HYBRID_SEARCH and not self.hybrid:
+            logger.warning(
+                f"Collection '{collection_name}' has no sparse vectors, searching dense only; "
+                "run app.scripts.migrate_collection to enable hybrid search"
             )
-            logger.info(f"Collection '{collection_name}' created")
+
+        await self.ensure_payload_indexes(collection_name)
+
+    async def ensure_payload_indexes(self, collection_name: str):
+        """Create the payload indexes that filtered searches rely on"""
+        info = await self._client.get_collection(collection_name)
+        existing = info.payload_schema or {}
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in existing:
+                await self._client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=schema,
+                )
+                logger.info(f"Created {schema.value} payload index on '{field_name}'")
 
     # ------------------ SAVE ------------------
+    def make_point(self, point_id: str, embedding: List[float], payload: Dict[str, Any]) -> PointStruct:
+        """Build a point in the collection's vector layout"""
+        if self.hybrid:
+            vector = {
+                DENSE_VECTOR: embedding,
+                SPARSE_VECTOR: sparse_document_vector(payload.get("chunk_text") or ""),
+            }
+        else:
+            vector = embedding
+        return PointStruct(id=point_id, vector=vector, payload=payload)
+
     async def save_embedding(self, embedding: List[float], payload: Dict[str, Any], collection_name=settings.COLLECTION_NAME):
         """Save human/AI conversation"""
         if not self.is_connected:
             await self.connect()
 
 
-        point = PointStruct(
-            id=str(uuid4()),
-            vector=embedding,
-            payload=payload
-        )
+        point = self.make_point(str(uuid4()), embedding, payload)
         await self._client.upsert(collection_name=collection_name, points=[point])
         # logger.info(f"Saved message embedding for user={payload.get('user_id')}, thread={payload.get('thread_id')}")
 
-    # ------------------ SEARCH ------------------
-    async def search_embedding(self, embedding: List[float], limit=15, collection_name=settings.COLLECTION_NAME):
-        """Retrieve most relevant past messages for a user"""
+    async def save_embeddings(
+        self,
+        embeddings: np.ndarray,
+        payloads: List[Dict[str, Any]],
+        collection_name=settings.COLLECTION_NAME,
+    ) -> List[str]:
+        """
+        Save many embeddings (a matrix, any float dtype) with their payloads in
+        batches, returning the point ids. Rows become float lists one batch at a
+        time, right before the batch is sent.
+        """
+        if len(embeddings) != len(payloads):
+            raise ValueError("embeddings and payloads must have the same length")
+        if not len(embeddings):
+            return []
+
+        if not self.is_connected:
+            await self.connect()
+
+        embeddings = np.asarray(embeddings)
+        point_ids = [str(uuid4()) for _ in payloads]
+        batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+
+        def _build(start: int) -> List[PointStruct]:
+            vectors = embeddings[start:start + batch_size].tolist()
+            return [
+                self.make_point(point_id, vector, payload)
+                for point_id, vector, payload in zip(
+                    point_ids[start:start + batch_size], vectors, payloads[start:start + batch_size]
+                )
+            ]
+
+        await self._upsert_batches(
+            list(range(0, len(point_ids), batch_size)), _build, collection_name=collection_name
+        )
+        return point_ids
+
+    async def upsert_points(
+        self,
+        points: List[PointStruct],
+        batch_size: Optional[int] = None,
+        parallel: Optional[int] = None,
+        wait: bool = False,
+        collection_name=settings.COLLECTION_NAME,
+    ):
+        """
+        Upsert points in batches with a bounded number of requests in flight.
+        With wait=False the batches are only acknowledged by Qdrant, so the last
+        batch is held back and sent with wait=True once all others are accepted.
+        Updates are applied in order, so this acts as a final consistency barrier.
+        """
+        if not points:
+            return
         if not self.is_connected:
             await self.connect()
 
-        query_vector = embedding  # Assuming `embedding` is already an embedding vector
+        batch_size = batch_size or settings.QDRANT_UPSERT_BATCH_SIZE
+        batches = [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+        await self._upsert_batches(batches, lambda batch: batch, parallel, wait, collection_name)
+
+    async def _upsert_batches(
+        self,
+        batches: List[Any],
+        build: Callable[[Any], List[PointStruct]],
+        parallel: Optional[int] = None,
+        wait: bool = False,
+        collection_name=settings.COLLECTION_NAME,
+    ):
+        """Upsert batches, each built into points only once it may be sent"""
+        parallel = parallel or settings.QDRANT_UPSERT_PARALLEL
+        semaphore = asyncio.Semaphore(parallel)
 
-        results = await self._client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            limit=limit,
+        async def _upsert(batch: Any, wait_batch: bool):
+            async with semaphore, stage_limits.qdrant_write:
+                await self._client.upsert(collection_name=collection_name, points=build(batch), wait=wait_batch)
+
+        barrier = batches.pop()
+        await asyncio.gather(*(_upsert(batch, wait) for batch in batches))
+        await _upsert(barrier, True)
+
+        logger.debug(f"Upserted {len(batches) + 1} batches")
+
+    # ------------------ UPDATE ------------------
+    async def set_payloads(self, payloads: Dict[str, Dict[str, Any]], collection_name=settings.COLLECTION_NAME):
+        """Update the payload of existing points (point id -> payload) in one batched request"""
+        if not payloads:
+            return
+        if not self.is_connected:
+            await self.connect()
+
+        operations = [
+            SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[point_id]))
+            for point_id, payload in payloads.items()
+        ]
+        async with stage_limits.qdrant_write:
+            await self._client.batch_update_points(collection_name=collection_name, update_operations=operations)
+
+    async def set_file_payload(self, file_path: str, payload: Dict[str, Any], collection_name=settings.COLLECTION_NAME):
+        """Update the payload of every point that belongs to a file"""
+        if not self.is_connected:
+            await self.connect()
+
+        async with stage_limits.qdrant_write:
+            await self._client.set_payload(
+                collection_name=collection_name,
+                payload=payload,
+                points=Filter(must=[FieldCondition(key="file_path", match=MatchValue(value=file_path))]),
+            )
+
+    async def delete_points(self, point_ids: List[str], collection_name=settings.COLLECTION_NAME):
+        """Delete points by id"""
+        if not point_ids:
+            return
+        if not self.is_connected:
+            await self.connect()
+
+        async with stage_limits.qdrant_write:
+            await self._client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=point_ids),
+            )
+        logger.debug(f"Deleted {len(point_ids)} stale points")
+
+    async def get_vectors(self, point_ids: List[str], collection_name=settings.COLLECTION_NAME) -> Dict[str, List[float]]:
+        """Dense vectors of existing points by id; ids that no longer exist are left out"""
+        if not point_ids:
+            return {}
+        if not self.is_connected:
+            await self.connect()
+
+        points = await self._client.retrieve(
+            collection_name=collection_name,
+            ids=point_ids,
+            with_payload=False,
+            with_vectors=[DENSE_VECTOR] if self.hybrid else True,
         )
-        return [hit.payload for hit in results]
+        return {
+            str(point.id): point.vector[DENSE_VECTOR] if isinstance(point.vector, dict) else point.vector
+            for point in points
+        }
+
+    # ------------------ SEARCH ------------------
+    async def search_embedding(
+        self,
+        embedding: List[float],
+        limit: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        query_text: Optional[str] = None,
+        collection_name=settings.COLLECTION_NAME,
+    ):
+        """
+        Retrieve the payloads of the most similar chunks, optionally scoped by filters.
+        With query_text on a hybrid collection the dense and BM25 sparse rankings
+        are prefetched separately and fused with reciprocal rank fusion.
+        """
+        if not self.is_connected:
+            await self.connect()
+
+        limit = limit or settings.SEARCH_LIMIT
+        query_filter = build_filter(filters)
+
+        if self.hybrid and query_text and settings.HYBRID_SEARCH:
+            prefetch_limit = max(settings.SEARCH_PREFETCH_LIMIT, limit)
+            results = await self._client.query_points(
+                collection_name=collection_name,
+                prefetch=[
+                    Prefetch(
+                        query=embedding,
+                        using=DENSE_VECTOR,
+                        filter=query_filter,
+                        params=search_params(),
+                        limit=prefetch_limit,
+                    ),
+                    Prefetch(
+                        query=sparse_query_vector(query_text),
+                        using=SPARSE_VECTOR,
+                        filter=query_filter,
+                        limit=prefetch_limit,
+                    ),
+                ],
+                query=FusionQuery(fusion=Fusion.RRF),
+                limit=limit,
+                with_payload=True,
+            )
+        else:
+            results = await self._client.query_points(
+                collection_name=collection_name,
+                query=embedding,
+                using=DENSE_VECTOR if self.hybrid else None,
+                query_filter=query_filter,
+                search_params=search_params(),
+                limit=limit,
+                with_payload=True,
+            )
+        return [hit.payload for hit in results.points]
 
 
 # Singleton manager
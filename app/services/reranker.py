@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.core.settings import settings
+from app.services.embeddings import count_tokens
+from app.services.model_registry import model_registry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def load_cross_encoder():
+    """Load the cross-encoder on CPU"""
+    from sentence_transformers import CrossEncoder  # Import here, only needed when reranking
+    return CrossEncoder(settings.RERANKER_MODEL, device="cpu")
+
+
+model_registry.register("reranker", load_cross_encoder, roles=("chat",) if settings.RERANKER_ENABLED else ())
+
+
+def _stitch(left: str, left_end: Optional[int], right: str, right_start: Optional[int]) -> str:
+    """
+    Join two consecutive chunks, dropping the text they share. A chunk's text
+    starts at its char_start document offset, so the shared part is cut off
+    by offset; chunks stored without offsets are joined as they are.
+    """
+    if left_end is None or right_start is None or right_start > left_end:
+        return f"{left}\n{right}"
+    return left + right[left_end - right_start:]
+
+
+def merge_hits(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop duplicate chunks and merge hits on consecutive chunk_index values of
+    the same file into one passage. Merged passages keep the rank of their
+    best member and list the chunk indices they cover.
+    """
+    seen = set()
+    by_file: Dict[Any, List[tuple]] = {}
+    for rank, hit in enumerate(hits):
+        # Identical text adds nothing to the prompt, even from another file
+        text = " ".join((hit.get("chunk_text") or "").split())
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        by_file.setdefault(hit.get("file_path"), []).append((rank, hit))
+
+    merged = []
+    for file_hits in by_file.values():
+        file_hits.sort(key=lambda item: (item[1].get("chunk_index") is None, item[1].get("chunk_index") or 0))
+        group: Optional[Dict[str, Any]] = None
+        # Document offset where the group's text ends
+        text_end: Optional[int] = None
+        for rank, hit in file_hits:
+            index = hit.get("chunk_index")
+            text = hit["chunk_text"].strip()
+            start = hit.get("char_start")
+            if group is not None and index is not None and index == group["chunk_indices"][-1] + 1:
+                group["chunk_text"] = _stitch(group["chunk_text"], text_end, text, start)
+                group["chunk_indices"].append(index)
+                group["rank"] = min(group["rank"], rank)
+                for key in ("char_end", "page_end"):
+                    if hit.get(key) is not None:
+                        group[key] = max(group.get(key) or 0, hit[key])
+                if start is not None:
+                    text_end = max(text_end or 0, start + len(text))
+                continue
+            if group is not None:
+                merged.append(group)
+            group = {
+                **hit,
+                "chunk_text": text,
+                "chunk_indices": [index] if index is not None else [],
+                "rank": rank,
+            }
+            text_end = start + len(text) if start is not None else None
+            if index is None:
+                merged.append(group)
+                group = None
+        if group is not None:
+            merged.append(group)
+
+    merged.sort(key=lambda hit: hit["rank"])
+    return merged
+
+
+def _score(query: str, texts: List[str]) -> List[float]:
+    scores = model_registry.get("reranker").predict(
+        [(query, text) for text in texts],
+        batch_size=settings.RERANKER_BATCH_SIZE,
+        show_progress_bar=False,
+    )
+    return [float(score) for score in scores]
+
+
+async def rerank(query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order hits by cross-encoder relevance to the query"""
+    if not hits:
+        return hits
+    scores = await asyncio.to_thread(_score, query, [hit["chunk_text"] for hit in hits])
+    for hit, score in zip(hits, scores):
+        hit["rerank_score"] = score
+    return sorted(hits, key=lambda hit: hit["rerank_score"], reverse=True)
+
+
+def pack_context(hits: List[Dict[str, Any]], token_budget: int, max_hits: int) -> List[Dict[str, Any]]:
+    """Keep the best hits, in order, whose texts fit in the token budget together"""
+    packed, used = [], 0
+    for hit, tokens in zip(hits, count_tokens([hit["chunk_text"] for hit in hits])):
+        if used + tokens > token_budget:
+            continue
+        packed.append(hit)
+        used += tokens
+        if len(packed) >= max_hits:
+            break
+    logger.debug(f"Packed {len(packed)} of {len(hits)} passages into {used} tokens")
+    return packed
+
+
+async def postprocess(query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge, optionally rerank and budget raw search hits for the prompt"""
+    passages = merge_hits(hits)
+    if settings.RERANKER_ENABLED:
+        passages = await rerank(query, passages)
+    # Tokenizing the passages is CPU work, kept off the event loop
+    return await asyncio.to_thread(pack_context, passages, settings.CONTEXT_TOKEN_BUDGET, settings.SEARCH_LIMIT)
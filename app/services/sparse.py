@@ -0,0 +1,87 @@
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+from qdrant_client.http.models import SparseVector
+
+from app.core.settings import settings
+
+# Arabic diacritics (tashkeel, superscript alef) and tatweel
+ARABIC_DIACRITICS = re.compile("[\u064B-\u0652\u0670\u0640]")
+
+ARABIC_LETTER_MAP = str.maketrans({
+    "أ": "ا",  # alef with hamza above -> alef
+    "إ": "ا",  # alef with hamza below -> alef
+    "آ": "ا",  # alef with madda -> alef
+    "ٱ": "ا",  # alef wasla -> alef
+    "ى": "ي",  # alef maksura -> ya
+    "ة": "ه",  # ta marbuta -> ha
+    "ؤ": "و",  # waw with hamza -> waw
+    "ئ": "ي",  # ya with hamza -> ya
+    # Arabic-Indic and Persian digits -> ASCII, so reference numbers match either way
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+STOPWORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+    # Arabic (normalized form)
+    "في", "من", "علي", "الي", "عن", "ان", "او", "ثم", "هذا", "هذه", "ذلك", "تلك",
+    "التي", "الذي", "الذين", "ما", "لا", "كان", "مع", "هو", "هي", "و",
+}
+
+# BM25 term-frequency saturation; IDF is applied by Qdrant (Modifier.IDF)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, Unicode forms and Arabic letter variants for lexical matching"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = ARABIC_DIACRITICS.sub("", text)
+    return text.translate(ARABIC_LETTER_MAP)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into lexical terms without stopwords"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(normalize_text(text)):
+        # Light stemming of the Arabic definite article
+        if len(token) > 4 and token.startswith("ال"):
+            token = token[2:]
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def token_id(token: str) -> int:
+    """Stable 31-bit index of a term in the sparse vector space"""
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: Dict[int, float]) -> SparseVector:
+    indices = sorted(weights)
+    return SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def sparse_document_vector(text: str) -> SparseVector:
+    """BM25 term-frequency weights of a chunk"""
+    tokens = tokenize(text)
+    length_norm = 1 - BM25_B + BM25_B * len(tokens) / settings.BM25_AVG_DOC_LENGTH
+
+    weights: Dict[int, float] = {}
+    for token, tf in Counter(tokens).items():
+        idx = token_id(token)
+        weights[idx] = weights.get(idx, 0.0) + tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+    return _to_sparse(weights)
+
+
+def sparse_query_vector(text: str) -> SparseVector:
+    """Query terms with unit weight; Qdrant scales them by IDF"""
+    return _to_sparse({token_id(token): 1.0 for token in set(tokenize(text))})
@@ -1,4 +1,5 @@
 import os
+import hashlib
 import aiofiles
 import uuid
 from fastapi import UploadFile, HTTPException
@@ -9,14 +10,15 @@ from app.core.settings import settings
 async def save_file(file: UploadFile, folder: str = settings.DATA_DIR) -> str:
     """
     Save an uploaded file asynchronously and return the saved path.
-    Generates a unique filename to avoid collisions.
+    The content is hashed while it streams to disk and the file is named
+    after its SHA-256 digest, so identical uploads share one copy.
 
     Args:
         file (UploadFile): The uploaded file object.
         folder (str): Directory to save the file. Default: 'data'.
 
     Returns:
-        str: Path where file is saved.
+        dict: Saved path, original filename and content hash.
     """
 
     # Ensure folder exists
@@ -29,16 +31,27 @@ async def save_file(file: UploadFile, folder: str = settings.DATA_DIR) -> str:
     # if ext not in ALLOWED_EXTENSIONS:
     #     raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-    # Unique filename (UUID)
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    file_path = os.path.join(folder, unique_name)
+    # Stream to a temporary name (UUID) until the hash is known
+    temp_path = os.path.join(folder, f".{uuid.uuid4().hex}{ext}.part")
+    hasher = hashlib.sha256()
 
     # Save file asynchronously
-    async with aiofiles.open(file_path, "wb") as out_file:
+    async with aiofiles.open(temp_path, "wb") as out_file:
         while chunk := await file.read(1024 * 1024):  # 1MB chunks
+            hasher.update(chunk)
             await out_file.write(chunk)
 
+    content_hash = hasher.hexdigest()
+    file_path = os.path.join(folder, f"{content_hash}{ext}")
+
+    if os.path.exists(file_path):
+        # Same bytes already on disk
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, file_path)
+
     return {
         "file_path": file_path,
         "original_filename": file.filename,
+        "content_hash": content_hash,
     }
@@ -1,14 +1,92 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import httpx
+from langchain_core.language_models import BaseChatModel
 from langchain_groq import ChatGroq
+from langgraph.prebuilt import create_react_agent
 
 from app.core.settings import settings
 
 from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
-def get_chat_model() -> ChatGroq:
-    """Return a ChatGroq model instance."""
-    return ChatGroq(
-        api_key=settings.GROQ_API_KEY,
-        model=settings.OPENAI_GPT_120,
-        temperature=settings.TEMPERATURE,
-    )
\ No newline at end of file
+# Long-lived clients shared by every request
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_chat_models: Dict[Tuple[str, float], BaseChatModel] = {}
+_agents: Dict[Tuple[str, float, Tuple[str, ...]], Any] = {}
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Return the shared, pooled HTTP transports used by the LLM clients."""
+    global _http_client, _http_async_client
+    if _http_async_client is None:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(settings.HTTP_TIMEOUT)
+        _http_client = httpx.Client(limits=limits, timeout=timeout)
+        _http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _http_client, _http_async_client
+
+
+def _model_key(model_name: Optional[str], temperature: Optional[float]) -> Tuple[str, float]:
+    return (
+        model_name or settings.OPENAI_GPT_120,
+        settings.TEMPERATURE if temperature is None else temperature,
+    )
+
+
+def get_chat_model(model_name: Optional[str] = None, temperature: Optional[float] = None) -> BaseChatModel:
+    """Return a shared ChatGroq model instance for the model and temperature."""
+    key = _model_key(model_name, temperature)
+    if key not in _chat_models:
+        http_client, http_async_client = get_http_clients()
+        _chat_models[key] = ChatGroq(
+            api_key=settings.GROQ_API_KEY,
+            model=key[0],
+            temperature=key[1],
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        logger.info(f"Created chat model client for {key[0]}")
+    return _chat_models[key]
+
+
+def register_chat_model(
+    model: BaseChatModel,
+    model_name: Optional[str] = None,
+    temperature: Optional[float] = None,
+):
+    """Register a chat model for a model name, e.g. a local fake in tests."""
+    key = _model_key(model_name, temperature)
+    _chat_models[key] = model
+    # Agents built on the previous model are stale
+    for agent_key in [k for k in _agents if k[:2] == key]:
+        del _agents[agent_key]
+
+
+def get_react_agent(
+    tools: Sequence[Any],
+    model_name: Optional[str] = None,
+    temperature: Optional[float] = None,
+):
+    """Return a prebuilt ReAct agent, built once per model and tool set."""
+    key = (*_model_key(model_name, temperature), tuple(t.name for t in tools))
+    if key not in _agents:
+        _agents[key] = create_react_agent(get_chat_model(model_name, temperature), tools=list(tools))
+        logger.info(f"Created ReAct agent for {key[0]} with tools {key[2]}")
+    return _agents[key]
+
+
+async def aclose_http_clients():
+    """Close the shared HTTP transports and drop the clients using them."""
+    global _http_client, _http_async_client
+    _chat_models.clear()
+    _agents.clear()
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_client.close()
+        _http_client = _http_async_client = None
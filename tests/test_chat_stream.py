@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+
+# Settings without defaults; nothing here reaches these services
+os.environ.setdefault("BASE_URL", "http://localhost")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("LANGSMITH_API_KEY", "test")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+os.environ.setdefault("LANGSMITH_ENDPOINT", "http://localhost")
+os.environ.setdefault("LANGSMITH_PROJECT", "test")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.checkpoint.memory import MemorySaver
+
+import app.agents.rag_chat.nodes as rag_nodes
+import app.agents.rag_chat.tools as rag_tools
+from app.agents.rag_chat.graph import rag_chat_graph
+from app.api.chat import router
+from app.core.settings import settings
+from app.utils.helpers import register_chat_model
+
+ANSWER = "Invoices are due in 30 days."
+PASSAGES = [{
+    "chunk_text": "Invoices are due in 30 days.",
+    "original_filename": "terms.pdf",
+    "file_path": "uploads/terms.pdf",
+    "file_category": "contracts",
+}]
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """With tools bound it calls vector_search for a new question; it streams answers word by word"""
+
+    with_tools: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"with_tools": True})
+
+    def _reply(self, messages) -> AIMessage:
+        if self.with_tools and isinstance(messages[-1], HumanMessage):
+            # A preamble streamed with the tool call must not reach the client
+            return AIMessage(
+                content="Searching the documents.",
+                tool_calls=[{"name": "vector_search", "args": {"query": messages[-1].content}, "id": "call-1"}],
+            )
+        return AIMessage(content=ANSWER)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        if reply.tool_calls:
+            call = reply.tool_calls[0]
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=reply.content,
+                tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}],
+            ))
+            return
+        words = reply.content.split(" ")
+        for idx, word in enumerate(words):
+            text = word if idx == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def search_documents(query, filters=None):
+        return PASSAGES
+
+    monkeypatch.setattr(rag_nodes, "search_documents", search_documents)
+    monkeypatch.setattr(rag_tools, "search_documents", search_documents)
+    # Cached answers would skip the model
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+    register_chat_model(FakeStreamingChatModel())
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.state.rag_chat_graph = asyncio.run(rag_chat_graph(MemorySaver()))
+    return TestClient(app)
+
+
+def read_events(response) -> list:
+    """(event, data) pairs of an SSE response body"""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def assert_answer_stream(events, expected_kinds):
+    kinds = [kind for kind, _ in events]
+    # All tokens sit between the retrieval step and the references
+    start = kinds.index(expected_kinds[-3]) + 1
+    end = kinds.index("references")
+    assert kinds[:start] + kinds[end:] == expected_kinds
+    assert set(kinds[start:end]) == {"token"}
+
+    tokens = [data["content"] for _, data in events[start:end]]
+    assert "".join(tokens) == ANSWER
+    assert events[-1][1]["answer"] == ANSWER
+    assert events[-2][1]["references"][0]["file_name"] == "terms.pdf"
+
+
+def test_react_stream_forwards_only_answer_tokens(client):
+    response = client.post("/api/chat/stream", json={"query": "When are invoices due?", "mode": "react"})
+    assert response.status_code == 200
+
+    assert_answer_stream(read_events(response), ["thread", "tool_start", "tool_end", "references", "done"])
+
+
+def test_direct_stream_forwards_only_answer_tokens(client):
+    response = client.post("/api/chat/stream", json={"query": "When are invoices due?", "mode": "direct"})
+    assert response.status_code == 200
+
+    assert_answer_stream(read_events(response), ["thread", "retrieval", "references", "done"])